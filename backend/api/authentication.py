@@ -0,0 +1,83 @@
+"""Аутентификация по токену с кэшем."""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+TOKEN_CACHE_KEY = 'auth-token:{}'
+# Пароль и счётчики в снимок не попадают: пароль подгружается при
+# обращении, а счётчики, обновляемые через F(), не перезаписываются
+# при сохранении пользователя из запроса.
+SNAPSHOT_EXCLUDED_FIELDS = (
+    'password', 'recipes_count', 'followers_count', 'following_count')
+
+
+def token_cache_key(key):
+    """Ключ кэша для токена: сам токен в кэш не пишется."""
+    return TOKEN_CACHE_KEY.format(
+        hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+
+def snapshot_fields():
+    """Поля пользователя, которые хранятся в снимке."""
+    return [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname not in SNAPSHOT_EXCLUDED_FIELDS
+    ]
+
+
+def invalidate_tokens(*keys):
+    """Удаляет токены из локального и общего кэша."""
+    cache_keys = [token_cache_key(key) for key in keys]
+    caches[CachedTokenAuthentication.local_cache].delete_many(cache_keys)
+    caches[CachedTokenAuthentication.shared_cache].delete_many(cache_keys)
+
+
+def invalidate_user_tokens(user_id):
+    """Удаляет из кэша все токены пользователя."""
+    invalidate_tokens(*Token.objects.filter(
+        user_id=user_id).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе на каждый запрос.
+
+    Снимок пользователя по токену хранится в памяти воркера несколько
+    секунд и в общем кэше несколько минут. При выходе, удалении токена
+    и сохранении пользователя (в том числе смене пароля) ключи
+    удаляются из общего кэша; локальные копии живут не дольше
+    local_timeout.
+    """
+
+    local_cache = 'local'
+    shared_cache = 'default'
+    local_timeout = 10
+    shared_timeout = 60 * 5
+
+    def authenticate_credentials(self, key):
+        """Пользователь и токен из кэша или из базы."""
+        cache_key = token_cache_key(key)
+        local = caches[self.local_cache]
+        snapshot = local.get(cache_key)
+        if snapshot is None:
+            snapshot = caches[self.shared_cache].get(cache_key)
+            if snapshot is not None:
+                local.set(cache_key, snapshot, self.local_timeout)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            fields = snapshot_fields()
+            snapshot = (fields, [getattr(user, name) for name in fields])
+            caches[self.shared_cache].set(
+                cache_key, snapshot, self.shared_timeout)
+            local.set(cache_key, snapshot, self.local_timeout)
+            return user, token
+        user = User.from_db('default', *snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.')
+        return user, Token(key=key, user=user)
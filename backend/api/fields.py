@@ -0,0 +1,53 @@
+"""Поля сериализаторов."""
+import io
+import uuid
+
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+
+class ImageUploadField(Base64ImageField):
+    """Картинка строкой base64 или файлом из multipart/form-data.
+
+    Перед полной проверкой Pillow читается только заголовок файла:
+    формат и размеры в пикселях.
+    """
+
+    max_pixels = 40_000_000
+    # Снимки многих телефонов Pillow распознаёт как MPO: это JPEG с
+    # дополнительными кадрами, сохраняется он как обычный JPEG.
+    format_aliases = {'mpo': 'jpeg'}
+
+    def to_internal_value(self, data):
+        """Принимает загруженный файл или строку base64."""
+        if isinstance(data, UploadedFile):
+            image_format = self.validate_header(data)
+            data.name = f'{uuid.uuid4()}.{image_format}'
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+    def get_file_extension(self, filename, decoded_file):
+        """Проверяет заголовок декодированной картинки."""
+        self.validate_header(io.BytesIO(decoded_file))
+        return super().get_file_extension(filename, decoded_file)
+
+    def validate_header(self, file):
+        """Проверяет формат и размеры по заголовку, возвращает формат."""
+        try:
+            with Image.open(file) as image:
+                image_format = (image.format or '').lower()
+                image_format = self.format_aliases.get(
+                    image_format, image_format)
+                width, height = image.size
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            file.seek(0)
+        if image_format not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        if width * height > self.max_pixels:
+            raise serializers.ValidationError(
+                'Слишком большое изображение.')
+        return image_format
@@ -1,5 +1,45 @@
 """Пагинация."""
+import base64
+import binascii
+import hashlib
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, кэширующий COUNT(*) для больших выборок.
+
+    Небольшие выборки считаются каждый раз, чтобы счётчик сразу
+    отражал изменения пользователя (избранное, список покупок).
+    """
+
+    count_cache_timeout = 60
+    count_cache_threshold = 1000
+
+    @cached_property
+    def count(self):
+        """Количество объектов с учётом кэша."""
+        try:
+            sql = str(self.object_list.query)
+        except Exception:
+            return super().count
+        key = 'pagination-count:' + hashlib.md5(
+            sql.encode('utf-8')).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            if count >= self.count_cache_threshold:
+                cache.set(key, count, self.count_cache_timeout)
+        return count
 
 
 class RecipePagination(PageNumberPagination):
@@ -7,3 +47,153 @@ class RecipePagination(PageNumberPagination):
 
     page_size = 6
     page_size_query_param = 'page_size'
+    max_page_size = 100
+    django_paginator_class = CachedCountPaginator
+
+
+class RecipeCursorPagination(RecipePagination):
+    """Пагинация ленты рецептов.
+
+    По умолчанию работает постранично. Если в запросе передан параметр
+    cursor (в том числе пустой), включается пагинация по ключу
+    (pub_date, id), которая не считает COUNT(*) и не использует OFFSET.
+    Если фильтры задали свой порядок (популярность, релевантность),
+    остаётся постраничный режим.
+    """
+
+    cursor_query_param = 'cursor'
+    ordering = ('-pub_date', '-id')
+
+    def cursor_enabled(self, request):
+        """Включена ли пагинация по ключу."""
+        return self.cursor_query_param in request.query_params
+
+    def has_custom_ordering(self, queryset):
+        """Задан ли порядок, отличный от ключа курсора."""
+        order_by = tuple(queryset.query.order_by)
+        return bool(order_by) and order_by != self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Разбивает queryset на страницы."""
+        self.use_cursor = (
+            self.cursor_enabled(request)
+            and not self.has_custom_ordering(queryset))
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            pub_date, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date)
+                    | Q(pub_date=pub_date, id__gt=pk)
+                ).reverse()
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date, id__lt=pk)
+                )
+
+        return self.set_page(
+            list(queryset[:page_size + 1]), page_size, position, reverse)
+
+    def paginate_keys(self, fetch_keys, request):
+        """Страница ключей (pub_date, id) от источника вне queryset.
+
+        fetch_keys(position, reverse, limit) возвращает ключи от позиции
+        курсора: по убыванию, а при reverse - по возрастанию.
+        """
+        self.use_cursor = True
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        return self.set_page(
+            list(fetch_keys(position, reverse, page_size + 1)),
+            page_size, position, reverse)
+
+    def set_page(self, results, page_size, position, reverse):
+        """Запоминает страницу и наличие соседних страниц."""
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        """Возвращает ответ со ссылками на соседние страницы."""
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        """Ссылка на следующую страницу."""
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """Ссылка на предыдущую страницу."""
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, recipe, reverse):
+        """Кодирует позицию рецепта в ссылку.
+
+        Рецепт - объект, словарь values или ключ (pub_date, id).
+        """
+        if isinstance(recipe, tuple):
+            pub_date, pk = recipe
+        elif isinstance(recipe, dict):
+            pub_date, pk = recipe['pub_date'], recipe['id']
+        else:
+            pub_date, pk = recipe.pub_date, recipe.pk
+        value = '{}|{}|{}'.format(int(reverse), pub_date.isoformat(), pk)
+        cursor = base64.urlsafe_b64encode(value.encode('ascii')).decode()
+        url = remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Декодирует позицию из параметра cursor."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            value = base64.urlsafe_b64decode(
+                encoded.encode('ascii')).decode('ascii')
+            reverse, pub_date, pk = value.split('|')
+            pub_date = parse_datetime(pub_date)
+            if pub_date is None:
+                raise ValueError
+            return (pub_date, int(pk)), bool(int(reverse))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound('Неверный курсор.')
+
+
+class FeedPagination(RecipeCursorPagination):
+    """Пагинация ленты подписок: по ключу, если порядок не изменён."""
+
+    def cursor_enabled(self, request):
+        """Лента листается только курсором."""
+        return True
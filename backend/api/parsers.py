@@ -0,0 +1,21 @@
+"""Парсеры запросов."""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class MessagePackParser(BaseParser):
+    """Тело запроса в формате MessagePack."""
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Распаковывает тело запроса."""
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException):
+            raise ParseError('Ошибка разбора MessagePack.')
@@ -1,7 +1,26 @@
 """Фильтры для рецептов."""
+from collections import defaultdict
+
 import django_filters
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value,
+    When)
+from django.db.models.functions import Cast, Coalesce
 from recipes.models import (
-    ShoppingCart, Favorite, Recipe, Tag, Ingredient)
+    ShoppingCart, Favorite, Recipe, Ingredient, RecipeIngredient,
+    normalize_name)
+from recipes.ingredient_index import ingredient_index, journal_enabled
+from recipes.registry import tag_registry
+from recipes.search import SEARCH_CONFIG
+
+MAX_MISSING_INGREDIENTS = 5
+MAX_INDEX_MATCHES = 1000
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    """Список чисел через запятую."""
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -17,12 +36,28 @@ class RecipeFilter(django_filters.FilterSet):
         choices=[('1', 'Да'), ('0', 'Нет')],
         label='В списке покупок'
     )
-    tags = django_filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_registry.choices,
+        method='filter_tags',
         label='Теги'
     )
+    search = django_filters.CharFilter(
+        method='filter_search',
+        label='Поиск'
+    )
+    ordering = django_filters.ChoiceFilter(
+        method='filter_ordering',
+        choices=[('popular', 'Популярные'), ('new', 'Новые')],
+        label='Сортировка'
+    )
+    ingredients = NumberInFilter(
+        method='filter_ingredients',
+        label='Имеющиеся ингредиенты'
+    )
+    missing = django_filters.NumberFilter(
+        method='filter_missing',
+        label='Сколько ингредиентов может не хватать'
+    )
 
     class Meta:
         """Мета данные."""
@@ -30,6 +65,94 @@ class RecipeFilter(django_filters.FilterSet):
         model = Recipe
         fields = ['author']
 
+    def filter_tags(self, queryset, name, value):
+        """Фильтр по slug тегов без запроса к таблице тегов."""
+        return queryset.filter(
+            tags__id__in=tag_registry.ids_for_slugs(value)).distinct()
+
+    def filter_ordering(self, queryset, name, value):
+        """Сортировка по сохранённой популярности или по дате."""
+        if value == 'popular':
+            return queryset.order_by('-popularity', '-pub_date', '-id')
+        return queryset.order_by('-pub_date', '-id')
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, описанию и ингредиентам.
+
+        На PostgreSQL используется сохранённый вектор с GIN-индексом и
+        сортировка по релевантности, на остальных базах - icontains.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value)
+                | Q(text__icontains=value)
+                | Q(recipeingredients__ingredient__name__icontains=value)
+            ).distinct()
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты из имеющихся ингредиентов по покрытию.
+
+        Кандидаты считаются по инвертированному индексу в памяти, в базу
+        уходит только список id, сгруппированный по доле покрытия. Если
+        журнал индекса вести негде или кандидатов больше
+        MAX_INDEX_MATCHES, покрытие считается в базе.
+        """
+        missing = self.form.cleaned_data.get('missing') or 0
+        missing = max(0, min(int(missing), MAX_MISSING_INGREDIENTS))
+        ingredient_ids = {int(ingredient_id) for ingredient_id in value}
+        if not journal_enabled():
+            return self.filter_ingredients_in_db(
+                queryset, ingredient_ids, missing)
+        matches = ingredient_index.match(ingredient_ids, missing)
+        if not matches:
+            return queryset.none()
+        if len(matches) > MAX_INDEX_MATCHES:
+            return self.filter_ingredients_in_db(
+                queryset, ingredient_ids, missing)
+        recipes_by_coverage = defaultdict(list)
+        for recipe_id, (matched, size) in matches.items():
+            recipes_by_coverage[matched / size].append(recipe_id)
+        return queryset.filter(pk__in=matches).annotate(
+            ingredient_coverage=Case(
+                *(When(pk__in=ids, then=Value(coverage))
+                  for coverage, ids in recipes_by_coverage.items()),
+                output_field=FloatField()
+            )
+        ).order_by('-ingredient_coverage', '-pub_date', '-id')
+
+    def filter_ingredients_in_db(self, queryset, ingredient_ids, missing):
+        """То же покрытие, посчитанное подзапросами к RecipeIngredient."""
+        rows = RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')).order_by().values('recipe')
+        matched = rows.filter(ingredient_id__in=ingredient_ids)
+        return queryset.filter(
+            pk__in=RecipeIngredient.objects.filter(
+                ingredient_id__in=ingredient_ids).values('recipe')
+        ).annotate(
+            ingredients_total=Subquery(
+                rows.annotate(total=Count('pk')).values('total')),
+            ingredients_matched=Coalesce(Subquery(
+                matched.annotate(total=Count('pk')).values('total')), 0),
+        ).filter(
+            ingredients_total__lte=F('ingredients_matched') + missing
+        ).annotate(
+            ingredient_coverage=Cast(
+                'ingredients_matched', FloatField()
+            ) / Cast('ingredients_total', FloatField())
+        ).order_by('-ingredient_coverage', '-pub_date', '-id')
+
+    def filter_missing(self, queryset, name, value):
+        """Учитывается в filter_ingredients."""
+        return queryset
+
     def filter_is_favorited(self, queryset, name, value):
         """Фильтр для избранного."""
         if not self.request.user.is_authenticated:
@@ -66,10 +189,27 @@ class RecipeFilter(django_filters.FilterSet):
 class IngredientFilter(django_filters.FilterSet):
     """Фильтр для ингридиентов."""
 
-    name = django_filters.CharFilter(lookup_expr='icontains')
+    name = django_filters.CharFilter(method='filter_name')
 
     class Meta:
         """Мета данные."""
 
         model = Ingredient
         fields = ['name']
+
+    def filter_name(self, queryset, name, value):
+        """Поиск: сначала по началу названия, затем по вхождению.
+
+        Внутри каждой группы выше идут ингредиенты, которые чаще
+        используются в рецептах.
+        """
+        value = normalize_name(value)
+        if not value:
+            return queryset
+        return queryset.filter(normalized_name__contains=value).annotate(
+            prefix_match=Case(
+                When(normalized_name__startswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('prefix_match', '-recipes_count', 'normalized_name')
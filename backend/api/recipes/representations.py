@@ -0,0 +1,116 @@
+"""Быстрое чтение рецептов без сериализаторов.
+
+Рецепты выбираются через values() и собираются в словари за один
+проход. Форма ответа совпадает с RecipeSerializer.
+"""
+from collections import defaultdict
+from operator import itemgetter
+
+from django.core.files.storage import default_storage
+from recipes.images import variant_urls
+from recipes.models import Recipe, RecipeIngredient
+from recipes.registry import tag_registry
+
+RECIPE_VALUES_FIELDS = (
+    'id', 'name', 'image', 'text', 'cooking_time', 'pub_date',
+    'is_favorited', 'is_in_shopping_cart', 'author_id',
+    'author__email', 'author__username', 'author__first_name',
+    'author__last_name', 'author__avatar',
+)
+
+
+def file_url(name, request=None):
+    """Ссылка на файл, как её отдаёт ImageField сериализатора."""
+    if not name:
+        return None
+    url = default_storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def get_ingredients(recipe_ids):
+    """Ингредиенты рецептов: {id рецепта: [словари]}."""
+    ingredients = defaultdict(list)
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount')
+    for recipe_id, ingredient_id, name, measurement_unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def get_tags(recipe_ids):
+    """Теги рецептов из реестра: {id рецепта: [словари]}.
+
+    Из базы выбираются только пары (рецепт, тег), порядок тегов - как
+    в реестре.
+    """
+    registry = {
+        tag['id']: (position, tag)
+        for position, tag in enumerate(tag_registry.all())
+    }
+    found = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids).values_list('recipe_id', 'tag_id')
+    for recipe_id, tag_id in rows:
+        if tag_id in registry:
+            found[recipe_id].append(registry[tag_id])
+    tags = defaultdict(list)
+    for recipe_id, recipe_tags in found.items():
+        tags[recipe_id] = [tag for _, tag in sorted(
+            recipe_tags, key=itemgetter(0))]
+    return tags
+
+
+def get_subscribed_ids(request, author_ids):
+    """Id авторов, на которых подписан текущий пользователь."""
+    user = request.user if request else None
+    if user is None or not user.is_authenticated:
+        return set()
+    return set(user.subscriber.filter(
+        subscribed_to__in=author_ids
+    ).values_list('subscribed_to_id', flat=True))
+
+
+def recipes_data(rows, request=None):
+    """Список словарей рецептов в форме RecipeSerializer."""
+    rows = list(rows)
+    recipe_ids = [row['id'] for row in rows]
+    ingredients = get_ingredients(recipe_ids)
+    tags = get_tags(recipe_ids)
+    subscribed_ids = get_subscribed_ids(
+        request, {row['author_id'] for row in rows})
+    data = []
+    for row in rows:
+        avatar = row['author__avatar']
+        data.append({
+            'id': row['id'],
+            'author': {
+                'id': row['author_id'],
+                'email': row['author__email'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'is_subscribed': row['author_id'] in subscribed_ids,
+                'avatar': file_url(avatar, request),
+                'avatar_variants': variant_urls(avatar, request),
+            },
+            'name': row['name'],
+            'image': file_url(row['image'], request),
+            'image_variants': variant_urls(row['image'], request),
+            'text': row['text'],
+            'ingredients': ingredients[row['id']],
+            'tags': tags[row['id']],
+            'cooking_time': row['cooking_time'],
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+        })
+    return data
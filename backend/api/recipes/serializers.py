@@ -1,10 +1,15 @@
 """Сериализаторы для рецептов."""
+import json
 from rest_framework import serializers
 from recipes.models import Ingredient, Tag, Recipe, RecipeIngredient
+from recipes.images import variant_urls
+from recipes.registry import tag_registry
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from api.users.serializers import UserSerializer
 from api.utils import recipe_create_and_update
-from drf_extra_fields.fields import Base64ImageField
+from django.http import QueryDict
+from api.fields import ImageUploadField
 
 
 User = get_user_model()
@@ -17,7 +22,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         """Мета данные."""
 
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -29,6 +34,13 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = '__all__'
 
+    def to_representation(self, instance):
+        """Берёт готовый словарь тега из реестра."""
+        data = tag_registry.get(instance.id)
+        if data is None:
+            return super().to_representation(instance)
+        return data
+
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для ингредиентов и количества."""
@@ -55,17 +67,24 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = serializers.ImageField()
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         """Мета данные."""
 
         model = Recipe
-        fields = ('id', 'author', 'name', 'image', 'text',
+        fields = ('id', 'author', 'name', 'image', 'image_variants', 'text',
                   'ingredients', 'tags', 'cooking_time',
                   'is_favorited', 'is_in_shopping_cart')
 
+    def get_image_variants(self, obj):
+        """Ссылки на уменьшенные копии картинки."""
+        return variant_urls(obj.image, self.context.get('request'))
+
     def get_is_favorited(self, obj):
         """Проверяет, находится ли рецепт в избранном пользователя."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -73,6 +92,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет, находится ли рецепт в списке покупок пользователя."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -100,7 +121,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             "min_length":
             "Список ингредиентов не должен быть пустым или быть больше 1."
         })
-    image = Base64ImageField()
+    image = ImageUploadField()
 
     class Meta:
         """Мета данные."""
@@ -108,7 +129,27 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = [
             'ingredients', 'tags', 'image', 'name', 'text', 'name',
-            'cooking_time', 'link']
+            'cooking_time']
+
+    def to_internal_value(self, data):
+        """Разбирает multipart/form-data.
+
+        Ингредиенты передаются JSON-строкой в поле ingredients,
+        теги - повторяющимся полем tags.
+        """
+        if isinstance(data, QueryDict):
+            parsed = {key: data[key] for key in data if key != 'tags'}
+            if 'tags' in data:
+                parsed['tags'] = data.getlist('tags')
+            if isinstance(parsed.get('ingredients'), str):
+                try:
+                    parsed['ingredients'] = json.loads(
+                        parsed['ingredients'])
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {'ingredients': ['Ожидается JSON-список.']})
+            data = parsed
+        return super().to_internal_value(data)
 
     def validate_image(self, value):
         """Проверяет, что поле image не пустое."""
@@ -130,6 +171,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         recipe_serializer = RecipeSerializer(instance, context=self.context)
         return recipe_serializer.data
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создает новый рецепт."""
         ingredients_data = validated_data.pop('ingredients', None)
@@ -138,6 +180,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         recipe_create_and_update(recipe, ingredients_data, tags_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Обновляет рецепт."""
         ingredients_data = validated_data.pop('ingredients', None)
@@ -150,11 +193,17 @@ class AddRecipeSerializer(serializers.ModelSerializer):
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сокращенный сериализатор для рецептов."""
 
+    image_variants = serializers.SerializerMethodField(read_only=True)
+
     class Meta:
         """Мета данные."""
 
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_variants', 'cooking_time']
+
+    def get_image_variants(self, obj):
+        """Ссылки на уменьшенные копии картинки."""
+        return variant_urls(obj.image, self.context.get('request'))
 
 
 class AddFavoriteAndShoppingCartSerializer(serializers.ModelSerializer):
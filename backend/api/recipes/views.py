@@ -2,25 +2,46 @@
 from rest_framework import viewsets
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
-from recipes.models import Ingredient, Tag, Recipe, Favorite, ShoppingCart
+from recipes.models import (
+    Ingredient, Tag, Recipe, RecipeIngredient, RecipeNeighbour, Favorite,
+    ShoppingCart)
 from .serializers import (
     TagSerializer, RecipeSerializer, IngredientSerializer,
-    AddRecipeSerializer, AddFavoriteAndShoppingCartSerializer)
+    AddRecipeSerializer, AddFavoriteAndShoppingCartSerializer,
+    RecipeShortSerializer)
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from .filters import RecipeFilter, IngredientFilter
+from .representations import RECIPE_VALUES_FIELDS, recipes_data
 from django_filters.rest_framework import DjangoFilterBackend
-from api.pagination import RecipePagination
+from api.pagination import FeedPagination, RecipeCursorPagination
 from api.permissions import IsOwner
+from recipes.feed import feed_filter, timeline_keys
+from recipes.registry import tag_registry
 from django.shortcuts import get_object_or_404, redirect
 from rest_framework.decorators import api_view, permission_classes
-from django.http import HttpResponse
-from api.utils import add_to_relation, delete_relation
+from django.db import transaction
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+from api.utils import (
+    SHOPPING_LIST_WRITERS, add_to_relation, cached_anonymous_response,
+    catalog_etag, delete_relation, get_shopping_list,
+    normalize_query, parse_id, recipe_etag, recipe_last_modified,
+    recipe_response_cache_key, resolve_short_link, shopping_list_response)
 
 User = get_user_model()
 
+RECIPE_READ_DEFERRED_FIELDS = (
+    'link', 'search_vector', 'author__password', 'author__last_login',
+    'author__is_superuser', 'author__is_staff', 'author__is_active',
+    'author__date_joined',
+)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet для ингредиентов."""
@@ -31,6 +52,33 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    search_limit = 20
+    max_search_limit = 100
+
+    @method_decorator(condition(etag_func=catalog_etag('ingredients')))
+    def list(self, request, *args, **kwargs):
+        """Список ингредиентов с поддержкой If-None-Match."""
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=catalog_etag('ingredients')))
+    def retrieve(self, request, *args, **kwargs):
+        """Ингредиент с поддержкой If-None-Match."""
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_search_limit(self):
+        """Количество результатов поиска из параметра limit."""
+        try:
+            limit = int(self.request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            return self.search_limit
+        return min(max(limit, 1), self.max_search_limit)
+
+    def filter_queryset(self, queryset):
+        """Ограничивает выдачу при поиске по названию."""
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and self.request.query_params.get('name'):
+            return queryset[:self.get_search_limit()]
+        return queryset
 
 
 class TagViewSet(viewsets.ModelViewSet):
@@ -41,21 +89,73 @@ class TagViewSet(viewsets.ModelViewSet):
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    @method_decorator(condition(etag_func=catalog_etag('tags')))
+    def list(self, request, *args, **kwargs):
+        """Список тегов из реестра с поддержкой If-None-Match."""
+        return Response(tag_registry.all())
+
+    @method_decorator(condition(etag_func=catalog_etag('tags')))
+    def retrieve(self, request, *args, **kwargs):
+        """Тег из реестра с поддержкой If-None-Match."""
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            data = tag_registry.get(int(lookup))
+        except ValueError:
+            data = None
+        if data is None:
+            raise Http404
+        return Response(data)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """ViewSet для рецептов."""
 
     serializer_class = RecipeSerializer
-    pagination_class = RecipePagination
+    pagination_class = RecipeCursorPagination
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwner]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    uncached_query_params = ('ingredients', 'missing')
+
+    def annotate_flags(self, queryset):
+        """Добавляет флаги избранного и списка покупок пользователя."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+        )
+
+    def get_read_queryset(self):
+        """Queryset для вывода рецептов через RecipeSerializer."""
+        return self.annotate_flags(
+            Recipe.objects.select_related('author').prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only('id')),
+                Prefetch(
+                    'recipeingredients',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient').order_by('id')
+                )
+            ).defer(*RECIPE_READ_DEFERRED_FIELDS))
+
+    def get_values_queryset(self, queryset=None):
+        """Отфильтрованные рецепты в виде values() для быстрого чтения."""
+        queryset = self.annotate_flags(
+            Recipe.objects.all() if queryset is None else queryset)
+        return self.filter_queryset(queryset).values(*RECIPE_VALUES_FIELDS)
 
     def get_queryset(self):
         """Получает queryset рецептов."""
-        return Recipe.objects.all().select_related(
-            'author').prefetch_related('tags', 'ingredients')
+        if self.action in ['list', 'retrieve']:
+            return self.get_read_queryset()
+        return Recipe.objects.select_related('author')
 
     def get_serializer_class(self):
         """Определяет сериализатор на основе действия."""
@@ -63,9 +163,81 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeSerializer
         return AddRecipeSerializer
 
+    def get_list_cache_key(self):
+        """Ключ кэша списка или None, если ответ не кэшируется.
+
+        Подбор по ингредиентам идёт через индекс в памяти воркера,
+        который обновляется с задержкой, поэтому такие ответы не
+        кэшируются.
+        """
+        request = self.request
+        if any(name in request.query_params
+               for name in self.uncached_query_params):
+            return None
+        paginator = self.paginator
+        params = [
+            *self.filterset_class.base_filters,
+            paginator.page_query_param,
+            paginator.page_size_query_param,
+            paginator.cursor_query_param,
+        ]
+        defaults = {
+            paginator.page_query_param: '1',
+            paginator.page_size_query_param: str(paginator.page_size),
+        }
+        cursor_mode = paginator.cursor_query_param in request.query_params
+        return recipe_response_cache_key(
+            request, normalize_query(request, params, defaults), 'list',
+            cursor_mode)
+
+    def get_detail_cache_key(self):
+        """Ключ кэша рецепта."""
+        return recipe_response_cache_key(
+            self.request, [], 'retrieve', self.kwargs[self.lookup_field])
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов, для анонимов - из кэша."""
+        return cached_anonymous_response(
+            request, self.get_list_cache_key, self.list_values,
+            *args, **kwargs)
+
+    def list_values(self, request, *args, **kwargs):
+        """Список рецептов, собранный из values() без сериализатора."""
+        rows = self.paginate_queryset(self.get_values_queryset())
+        data = recipes_data(rows, request)
+        if rows is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve_values(self, request, *args, **kwargs):
+        """Рецепт, собранный из values() без сериализатора."""
+        recipe_id = parse_id(kwargs[self.lookup_field])
+        if recipe_id is None:
+            raise Http404
+        row = self.get_values_queryset().filter(pk=recipe_id).first()
+        if row is None:
+            raise Http404
+        return Response(recipes_data([row], request)[0])
+
+    @method_decorator(condition(
+        etag_func=recipe_etag, last_modified_func=recipe_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт с поддержкой условных запросов."""
+        response = cached_anonymous_response(
+            request, self.get_detail_cache_key, self.retrieve_values,
+            *args, **kwargs)
+        patch_cache_control(response, no_cache=True)
+        return response
+
     def perform_create(self, serializer):
         """Сохраняет автора рецепта."""
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        serializer.instance = self.get_read_queryset().get(pk=recipe.pk)
+
+    def perform_update(self, serializer):
+        """Сохраняет изменения рецепта."""
+        recipe = serializer.save()
+        serializer.instance = self.get_read_queryset().get(pk=recipe.pk)
 
     @action(
         detail=True, methods=['POST'], url_path='favorite',
@@ -95,23 +267,71 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Возвращает короткую ссылку на рецепт."""
         result = get_object_or_404(Recipe, pk=pk)
         return Response(
-            {"short-link": request.build_absolute_uri(f"/s/{result.link}/")},
+            {"short-link": request.build_absolute_uri(
+                f"/s/{result.short_link}/")},
             status=status.HTTP_200_OK
         )
 
+    @action(
+        detail=False, methods=['GET'], url_path='feed',
+        permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Последние рецепты авторов из подписок.
+
+        Без фильтров страница берётся по индексу таблицы ленты, с
+        фильтрами - из рецептов с условием feed_filter.
+        """
+        paginator = FeedPagination()
+        if any(name in request.query_params
+               for name in self.filterset_class.base_filters):
+            queryset = self.get_values_queryset(
+                Recipe.objects.filter(feed_filter(request.user)))
+            rows = paginator.paginate_queryset(queryset, request, view=self)
+        else:
+            keys = paginator.paginate_keys(
+                lambda *args: timeline_keys(request.user, *args), request)
+            recipe_ids = [pk for _, pk in keys]
+            found = {
+                row['id']: row for row in self.get_values_queryset().filter(
+                    pk__in=recipe_ids)
+            }
+            rows = [found[pk] for pk in recipe_ids if pk in found]
+        return paginator.get_paginated_response(recipes_data(rows, request))
+
+    @action(
+        detail=True, methods=['GET'], url_path='similar',
+        permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        """Похожие рецепты из заранее посчитанной таблицы."""
+        recipe_id = parse_id(pk)
+        if recipe_id is None:
+            raise Http404
+        rows = RecipeNeighbour.objects.filter(
+            recipe_id=recipe_id
+        ).select_related('neighbour').only(
+            'neighbour__id', 'neighbour__name', 'neighbour__image',
+            'neighbour__cooking_time'
+        ).order_by('-score', 'neighbour_id')
+        recipes = [row.neighbour for row in rows]
+        if not recipes:
+            get_object_or_404(Recipe.objects.only('id'), pk=recipe_id)
+        return Response(RecipeShortSerializer(
+            recipes, many=True, context={'request': request}).data)
+
     @action(
         detail=True, methods=['POST'], url_path='shopping_cart',
         permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
         """Добавляет рецепт в список покупок."""
-        return add_to_relation(
-            model=Recipe,
-            request=request,
-            pk=pk,
-            serializer_class=AddFavoriteAndShoppingCartSerializer,
-            related_field='recipe',
-            model_serializer=ShoppingCart
-        )
+        with transaction.atomic():
+            return add_to_relation(
+                model=Recipe,
+                request=request,
+                pk=pk,
+                serializer_class=AddFavoriteAndShoppingCartSerializer,
+                related_field='recipe',
+                model_serializer=ShoppingCart
+            )
 
     @shopping_cart.mapping.delete
     def shopping_cart_delete(self, request, pk=None):
@@ -125,37 +345,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated])
     def download_basket(self, request):
         """Скачивает список покупок."""
-        basket = request.user.shoppingcarts.all()
-        ingredients = {}
-
-        for result in basket:
-            recipe_ingredients = result.recipe.recipeingredients.all()
-            for ingredient in recipe_ingredients:
-                name = ingredient.ingredient.name
-                measurement_unit = ingredient.ingredient.measurement_unit
-                amount = ingredient.amount
-
-                if name in ingredients:
-                    ingredients[name]['amount'] += amount
-                else:
-                    ingredients[name] = {
-                        'measurement_unit': measurement_unit,
-                        'amount': amount,
-                    }
-
-        list_text = "Список покупок:\n"
-        for name, value in ingredients.items():
-            list_text += (
-                f"- {name} ({value['measurement_unit']}) - "
-                f"{value['amount']}\n")
-        response = HttpResponse(list_text, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename="list.txt"'
-        return response
+        filetype = request.query_params.get('filetype', 'txt')
+        if filetype not in SHOPPING_LIST_WRITERS:
+            return Response(
+                {"detail": "Допустимые форматы: "
+                 f"{', '.join(SHOPPING_LIST_WRITERS)}."},
+                status=status.HTTP_400_BAD_REQUEST)
+        rows = get_shopping_list(request.user).iterator()
+        return shopping_list_response(rows, filetype)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def short_link(request, link):
     """Короткая ссылка."""
-    recipe = get_object_or_404(Recipe, link=link)
-    return redirect(f'/recipes/{recipe.id}/')
+    recipe_id = resolve_short_link(link)
+    if recipe_id is None:
+        raise Http404
+    return redirect(f'/recipes/{recipe_id}/')
@@ -0,0 +1,67 @@
+"""Рендереры ответов."""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON через orjson, совместимый с выводом JSONRenderer.
+
+    Даты, Decimal, ленивые строки и прочие нестандартные типы
+    передаются в JSONEncoder DRF, поэтому их представление не меняется.
+    С отступами (браузерный API), с ensure_ascii и без orjson
+    используется стандартный рендерер.
+
+    Отличия от JSONRenderer касаются только float, которых в ответах
+    API сейчас нет:
+    - экспонента пишется без знака + и ведущего нуля: 1e16 вместо
+      1e+16, 1e-7 вместо 1e-07;
+    - NaN и бесконечности выводятся как null, а JSONRenderer при
+      STRICT_JSON выбрасывает ValueError.
+    Оба отличия закреплены в api/tests/test_renderers.py.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Сериализует data в байты JSON."""
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {})):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=(orjson.OPT_PASSTHROUGH_DATETIME
+                        | orjson.OPT_NON_STR_KEYS))
+        except TypeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в формате MessagePack для клиентов с Accept: msgpack."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Упаковывает data, нестандартные типы - как в JSON."""
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data, default=JSONEncoder().default, use_bin_type=True,
+            datetime=False)
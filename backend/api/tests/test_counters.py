@@ -0,0 +1,121 @@
+"""Денормализованные счётчики совпадают со свежим COUNT."""
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Ingredient, Recipe, RecipeIngredient
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class CountersTest(APITestCase):
+    """Счётчики обновляются через F() при каждом изменении связей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Пользователи, ингредиенты и рецепты первого автора."""
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}', password='password-123')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.recipes = [
+            cls.create_recipe(cls.users[0], number) for number in range(2)
+        ]
+
+    @classmethod
+    def create_recipe(cls, author, number):
+        """Рецепт с двумя ингредиентами."""
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=10, image=f'images/recipe-{number}.png')
+        for ingredient in cls.ingredients[number % 2:number % 2 + 2]:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=10)
+        return recipe
+
+    def assertCounters(self):
+        """Все счётчики равны COUNT по связям."""
+        for user in User.objects.all():
+            self.assertEqual(
+                (user.recipes_count, user.followers_count,
+                 user.following_count),
+                (Recipe.objects.filter(author=user).count(),
+                 Subscription.objects.filter(subscribed_to=user).count(),
+                 Subscription.objects.filter(user=user).count()),
+                user.username)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count,
+                Favorite.objects.filter(recipe=recipe).count(), recipe.name)
+        for ingredient in Ingredient.objects.all():
+            self.assertEqual(
+                ingredient.recipes_count,
+                RecipeIngredient.objects.filter(
+                    ingredient=ingredient).count(), ingredient.name)
+
+    def request(self, user, method, url):
+        """Запрос от имени пользователя, который должен пройти."""
+        self.client.force_authenticate(user)
+        response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 300, response.content)
+
+    def test_favorites_and_subscriptions(self):
+        """Добавление и удаление избранного и подписок."""
+        for user in self.users[1:]:
+            self.request(
+                user, 'post', f'/api/recipes/{self.recipes[0].id}/favorite/')
+            self.request(
+                user, 'post', f'/api/users/{self.users[0].id}/subscribe/')
+        self.request(
+            self.users[0], 'post', f'/api/users/{self.users[1].id}/subscribe/')
+        self.assertCounters()
+
+        self.request(
+            self.users[1], 'delete',
+            f'/api/recipes/{self.recipes[0].id}/favorite/')
+        self.request(
+            self.users[1], 'delete',
+            f'/api/users/{self.users[0].id}/subscribe/')
+        self.assertCounters()
+
+    def test_self_subscription_rejected(self):
+        """Подписка на себя не проходит и не меняет счётчики."""
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(
+            f'/api/users/{self.users[0].id}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+        self.assertCounters()
+
+    def test_recipes(self):
+        """Создание, замена ингредиента и удаление рецептов."""
+        recipe = self.create_recipe(self.users[1], 2)
+        Favorite.objects.create(user=self.users[2], recipe=recipe)
+        self.assertCounters()
+
+        row = recipe.recipeingredients.first()
+        row.ingredient = self.ingredients[2]
+        row.save()
+        self.assertCounters()
+
+        self.request(self.users[1], 'delete', f'/api/recipes/{recipe.id}/')
+        self.request(
+            self.users[0], 'delete', f'/api/recipes/{self.recipes[1].id}/')
+        self.assertCounters()
+
+    def test_user_deleted(self):
+        """Удаление пользователя со всеми его связями."""
+        Favorite.objects.create(user=self.users[1], recipe=self.recipes[0])
+        Subscription.objects.create(
+            user=self.users[1], subscribed_to=self.users[0])
+        Subscription.objects.create(
+            user=self.users[2], subscribed_to=self.users[1])
+        self.assertCounters()
+        self.users[1].delete()
+        self.assertCounters()
@@ -0,0 +1,115 @@
+"""Лента подписок на таблице FeedEntry."""
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+@override_settings(FEED_FANOUT_LIMIT=2)
+class FeedTest(TransactionTestCase):
+    """Ленты заполняются в фоне после фиксации транзакции.
+
+    Фоновые задачи идут в пул из одного потока, поэтому пустая задача,
+    дождавшаяся своей очереди, означает, что все предыдущие выполнены.
+    """
+
+    def setUp(self):
+        """Авторы, читатели и пул фоновых задач."""
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        patcher = mock.patch(
+            'recipes.feed.get_executor', return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.executor.shutdown)
+        self.author, self.popular, *self.readers = [
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}', password='password-123')
+            for number in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.readers[0])
+
+    def wait(self):
+        """Ждёт выполнения поставленных фоновых задач."""
+        self.executor.submit(lambda: None).result()
+
+    def subscribe(self, user, author):
+        """Подписка пользователя на автора."""
+        Subscription.objects.create(user=user, subscribed_to=author)
+
+    def publish(self, author, count):
+        """Рецепты автора."""
+        return [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10)
+            for number in range(count)
+        ]
+
+    def feed_ids(self, reader):
+        """Id рецептов из ленты в порядке выдачи."""
+        return list(FeedEntry.objects.filter(user=reader).order_by(
+            '-pub_date', '-recipe_id').values_list('recipe_id', flat=True))
+
+    def test_fan_out_and_unsubscribe(self):
+        """Публикация раскладывается по лентам, отписка их чистит."""
+        self.publish(self.author, 2)
+        self.subscribe(self.readers[0], self.author)
+        recipes = self.publish(self.author, 2)
+        self.wait()
+        self.assertEqual(
+            self.feed_ids(self.readers[0]),
+            list(Recipe.objects.filter(author=self.author).order_by(
+                '-pub_date', '-id').values_list('id', flat=True)))
+
+        Subscription.objects.filter(user=self.readers[0]).delete()
+        self.wait()
+        self.assertEqual(self.feed_ids(self.readers[0]), [])
+        self.assertFalse(
+            FeedEntry.objects.filter(recipe__in=recipes).exists())
+
+    def test_backfill_below_limit(self):
+        """Когда подписчиков снова не больше лимита, ленты заполняются."""
+        for reader in self.readers:
+            self.subscribe(reader, self.popular)
+        self.wait()
+        recipes = self.publish(self.popular, 3)
+        self.wait()
+        self.assertFalse(FeedEntry.objects.exists())
+
+        Subscription.objects.filter(user=self.readers[2]).delete()
+        self.wait()
+        expected = sorted(
+            (recipe.id for recipe in recipes), reverse=True)
+        for reader in self.readers[:2]:
+            self.assertEqual(self.feed_ids(reader), expected)
+        self.assertEqual(self.feed_ids(self.readers[2]), [])
+
+    def test_feed_pages(self):
+        """Страницы ленты сливают таблицу ленты и популярных авторов."""
+        for reader in self.readers:
+            self.subscribe(reader, self.popular)
+        self.subscribe(self.readers[0], self.author)
+        for number in range(3):
+            self.publish(self.author, 1)
+            self.publish(self.popular, 1)
+        self.wait()
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+        url = '/api/recipes/feed/?page_size=4'
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([recipe['id'] for recipe in data['results']])
+            url = data['next']
+        self.assertEqual([len(page) for page in pages], [4, 2])
+        self.assertEqual(sum(pages, []), expected)
@@ -0,0 +1,125 @@
+"""Подбор рецептов по имеющимся ингредиентам."""
+import random
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from api.recipes.filters import RecipeFilter
+from recipes.cache import bump_version
+from recipes.ingredient_index import (
+    INDEX_VERSION, IngredientIndex, ingredient_index, record_change)
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+
+class IngredientIndexTest(TestCase):
+    """Индекс и запрос к базе совпадают с перебором."""
+
+    queries = ((0, 1, 2), (3,), (1, 4, 5, 6, 7), tuple(range(12)))
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты со случайными наборами из двенадцати ингредиентов."""
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password-123')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(12)
+        ]
+        generator = random.Random(7)
+        for number in range(40):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image=f'images/recipe-{number}.png')
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=10)
+                for ingredient in generator.sample(
+                    cls.ingredients, generator.randint(1, 6))
+            ])
+
+    def setUp(self):
+        """Общий индекс мог остаться от других тестов."""
+        bump_version(INDEX_VERSION)
+        ingredient_index.invalidate()
+
+    def ids(self, positions):
+        """Id ингредиентов по номерам."""
+        return [self.ingredients[position].id for position in positions]
+
+    def brute_force(self, ingredient_ids, missing):
+        """Ожидаемый ответ match перебором всех рецептов."""
+        recipes = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id'):
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        expected = {}
+        for recipe_id, ingredients in recipes.items():
+            matched = len(ingredients & set(ingredient_ids))
+            if matched and len(ingredients) - matched <= missing:
+                expected[recipe_id] = (matched, len(ingredients))
+        return expected
+
+    def test_match(self):
+        """match совпадает с перебором для разных запросов."""
+        index = IngredientIndex()
+        for positions in self.queries:
+            for missing in range(3):
+                with self.subTest(positions=positions, missing=missing):
+                    ingredient_ids = self.ids(positions)
+                    self.assertEqual(
+                        index.match(ingredient_ids, missing),
+                        self.brute_force(ingredient_ids, missing))
+
+    def test_incremental_update(self):
+        """Изменения из журнала применяются без полной перестройки."""
+        index = IngredientIndex()
+        index.match(self.ids((0,)))
+        recipe = Recipe.objects.order_by('id').first()
+        recipe.recipeingredients.all().delete()
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in self.ingredients[:2]
+        ])
+        record_change(recipe.id)
+        index.invalidate()
+        with mock.patch.object(index, '_build', side_effect=AssertionError):
+            self.assertEqual(
+                index.match(self.ids((0, 1)), 1),
+                self.brute_force(self.ids((0, 1)), 1))
+
+    def filter_recipes(self, positions, missing):
+        """Id и покрытие рецептов из RecipeFilter в порядке выдачи."""
+        queryset = RecipeFilter(data={
+            'ingredients': ','.join(map(str, self.ids(positions))),
+            'missing': missing,
+        }, queryset=Recipe.objects.all()).qs
+        return [
+            (recipe.id, recipe.ingredient_coverage) for recipe in queryset]
+
+    def test_filter_paths(self):
+        """Индекс, запрос к базе и перебор дают одну и ту же выдачу."""
+        for positions in self.queries:
+            for missing in range(3):
+                with self.subTest(positions=positions, missing=missing):
+                    expected = self.brute_force(self.ids(positions), missing)
+                    in_db = self.filter_recipes(positions, missing)
+                    self.assertEqual(
+                        {recipe_id: coverage
+                         for recipe_id, coverage in in_db},
+                        {recipe_id: matched / size
+                         for recipe_id, (matched, size) in expected.items()})
+                    with mock.patch(
+                            'api.recipes.filters.journal_enabled',
+                            return_value=True):
+                        self.assertEqual(
+                            self.filter_recipes(positions, missing), in_db)
+                        with mock.patch(
+                                'api.recipes.filters.MAX_INDEX_MATCHES', 0):
+                            self.assertEqual(
+                                self.filter_recipes(positions, missing),
+                                in_db)
@@ -0,0 +1,66 @@
+"""Пагинация списка рецептов по ключу (pub_date, id)."""
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class RecipeCursorPaginationTest(APITestCase):
+    """Курсор обходит список без пропусков и повторов в обе стороны."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты, часть из которых опубликована в одну и ту же секунду."""
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            password='password-123')
+        recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image=f'images/recipe-{number}.png')
+            for number in range(8)
+        ]
+        moment = timezone.now() - datetime.timedelta(days=1)
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes[2:6]]
+        ).update(pub_date=moment)
+        cls.expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        """Запросы от имени пользователя, чтобы не попадать в кэш."""
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, link):
+        """Id рецептов по страницам, пока есть ссылка link."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            pages.append([recipe['id'] for recipe in data['results']])
+            url = data[link]
+        return pages
+
+    def test_forward_and_back(self):
+        """Вперёд по next и обратно по previous с последней страницы."""
+        pages = self.walk('/api/recipes/?cursor=&page_size=3', 'next')
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        last = self.client.get('/api/recipes/?cursor=&page_size=3')
+        url = last.json()['next']
+        url = self.client.get(url).json()['next']
+        back = self.walk(url, 'previous')
+        self.assertEqual(sum(reversed(back), []), self.expected)
+
+    def test_invalid_cursor(self):
+        """Испорченный курсор даёт 404."""
+        response = self.client.get('/api/recipes/?cursor=bm90LWEtY3Vyc29y')
+        self.assertEqual(response.status_code, 404)
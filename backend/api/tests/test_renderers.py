@@ -0,0 +1,94 @@
+"""Совместимость ORJSONRenderer со стандартным JSONRenderer."""
+import datetime
+import decimal
+import uuid
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api.renderers import ORJSONRenderer, orjson
+from recipes.models import Recipe, Tag
+
+
+@skipIf(orjson is None, 'orjson не установлен')
+class ORJSONRendererTest(SimpleTestCase):
+    """Байты ответа совпадают со стандартным рендерером, кроме float."""
+
+    def render(self, data):
+        """Вывод обоих рендереров."""
+        return ORJSONRenderer().render(data), JSONRenderer().render(data)
+
+    def test_same_bytes(self):
+        """Даты, Decimal, ленивые строки, юникод и вложенность."""
+        data = {
+            'id': 7,
+            'name': 'Борщ с пампушками',
+            'text': 'Строка\u2028перенос\u2029абзац',
+            'published': datetime.datetime(
+                2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 5, 1),
+            'time': datetime.time(7, 5),
+            'duration': datetime.timedelta(minutes=90),
+            'amount': decimal.Decimal('12.50'),
+            'label': gettext_lazy('Рецепт'),
+            'key': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'flags': [True, False, None],
+            'ratio': 0.1,
+            'nested': {'tags': [{'slug': 'breakfast'}], 'empty': {}},
+        }
+        rendered, expected = self.render(data)
+        self.assertEqual(rendered, expected)
+
+    def test_float_exponent_differs(self):
+        """Экспонента float записывается короче, чем в json.dumps."""
+        rendered, expected = self.render([1e16, 1e-7])
+        self.assertEqual(expected, b'[1e+16,1e-07]')
+        self.assertEqual(rendered, b'[1e16,1e-7]')
+
+    def test_nan_renders_null(self):
+        """NaN и бесконечность становятся null вместо ошибки."""
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float('nan')])
+        rendered = ORJSONRenderer().render(
+            [float('nan'), float('inf'), float('-inf')])
+        self.assertEqual(rendered, b'[null,null,null]')
+
+
+class ConditionalFormatTest(APITestCase):
+    """ETag различается для разных форматов ответа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Тег и рецепт для условных запросов."""
+        author = get_user_model().objects.create_user(
+            email='author@example.com', username='author',
+            password='password-123')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание', cooking_time=10,
+            image='images/recipe.png')
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def test_etag_depends_on_format(self):
+        """JSON не отдаётся как 304 на запрос браузерного API и наоборот."""
+        for url in ('/api/tags/', '/api/ingredients/',
+                    f'/api/recipes/{self.recipe.id}/'):
+            with self.subTest(url=url):
+                etags = {}
+                for accept in ('application/json', 'text/html'):
+                    response = self.client.get(url, HTTP_ACCEPT=accept)
+                    self.assertEqual(response.status_code, 200)
+                    etags[accept] = response['ETag']
+                self.assertNotEqual(
+                    etags['application/json'], etags['text/html'])
+                response = self.client.get(
+                    url, HTTP_ACCEPT='text/html',
+                    HTTP_IF_NONE_MATCH=etags['application/json'])
+                self.assertEqual(response.status_code, 200)
+                response = self.client.get(
+                    url, HTTP_ACCEPT='application/json',
+                    HTTP_IF_NONE_MATCH=etags['application/json'])
+                self.assertEqual(response.status_code, 304)
@@ -0,0 +1,113 @@
+"""Совпадение быстрого чтения рецептов с RecipeSerializer."""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.recipes.representations import RECIPE_VALUES_FIELDS, recipes_data
+from api.recipes.serializers import RecipeSerializer
+from api.recipes.views import RecipeViewSet
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class RecipeRepresentationParityTest(APITestCase):
+    """recipes_data отдаёт те же байты JSON, что и RecipeSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Авторы с аватаром и без, теги, ингредиенты и флаги читателя."""
+        cls.reader = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            password='password-123')
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Анна', last_name='Петрова',
+            password='password-123', avatar='users/author.png')
+        cls.other = User.objects.create_user(
+            email='other@example.com', username='other',
+            password='password-123')
+        with cls.captureOnCommitCallbacks(execute=True):
+            breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+            dinner = Tag.objects.create(name='Ужин', slug='dinner')
+            lunch = Tag.objects.create(name='Обед', slug='lunch')
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ]
+        cls.recipes = []
+        for number, author in enumerate(
+                (cls.author, cls.other, cls.author)):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10 + number,
+                image=f'images/recipe-{number}.png')
+            recipe.tags.set((dinner, breakfast, lunch)[:number + 1])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=(number + 1) * 10 + position)
+                for position, ingredient in enumerate(
+                    reversed(ingredients[number:]))
+            ])
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        Subscription.objects.create(
+            user=cls.reader, subscribed_to=cls.author)
+
+    def make_request(self, user, path='/api/recipes/'):
+        """Запрос DRF от имени пользователя."""
+        request = Request(APIRequestFactory().get(path))
+        request.user = user
+        return request
+
+    def render_both(self, user):
+        """JSON списка рецептов через сериализатор и через values()."""
+        request = self.make_request(user)
+        view = RecipeViewSet(request=request, action='list', kwargs={})
+        ordering = ('-pub_date', '-id')
+        serialized = RecipeSerializer(
+            view.get_read_queryset().order_by(*ordering), many=True,
+            context={'request': request}).data
+        rows = view.annotate_flags(Recipe.objects.all()).order_by(
+            *ordering).values(*RECIPE_VALUES_FIELDS)
+        renderer = JSONRenderer()
+        return (
+            renderer.render(serialized),
+            renderer.render(recipes_data(rows, request)),
+        )
+
+    def test_anonymous_list(self):
+        """Список для анонимного пользователя."""
+        expected, actual = self.render_both(AnonymousUser())
+        self.assertEqual(actual, expected)
+
+    def test_authenticated_list(self):
+        """Список с избранным, списком покупок и подпиской читателя."""
+        expected, actual = self.render_both(self.reader)
+        self.assertEqual(actual, expected)
+        self.assertIn(b'"is_favorited":true', actual)
+        self.assertIn(b'"is_in_shopping_cart":true', actual)
+        self.assertIn(b'"is_subscribed":true', actual)
+
+    def test_detail_endpoint(self):
+        """Ответ /api/recipes/{id}/ совпадает с сериализатором."""
+        recipe = self.recipes[2]
+        for user in (None, self.reader):
+            with self.subTest(user=user):
+                self.client.force_authenticate(user)
+                response = self.client.get(f'/api/recipes/{recipe.id}/')
+                request = self.make_request(
+                    user or AnonymousUser(), f'/api/recipes/{recipe.id}/')
+                view = RecipeViewSet(
+                    request=request, action='retrieve', kwargs={})
+                expected = RecipeSerializer(
+                    view.get_read_queryset().get(pk=recipe.id),
+                    context={'request': request}).data
+                self.assertEqual(response.json(), expected)
@@ -0,0 +1,107 @@
+"""Сводный список покупок совпадает с суммой по рецептам из корзины."""
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Ingredient, Recipe, RecipeIngredient, ShoppingListItem, Tag)
+
+User = get_user_model()
+
+
+class ShoppingListAggregateTest(APITestCase):
+    """ShoppingListItem пересчитывается при каждом изменении корзины."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Два рецепта с общими ингредиентами и два покупателя."""
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password-123')
+        cls.buyers = [
+            User.objects.create_user(
+                email=f'buyer{number}@example.com',
+                username=f'buyer{number}', password='password-123')
+            for number in range(2)
+        ]
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.tag = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ]
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10,
+                image=f'images/recipe-{number}.png')
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=10 * (number + 1) + position)
+                for position, ingredient in enumerate(
+                    cls.ingredients[number:number + 3])
+            ])
+            cls.recipes.append(recipe)
+
+    def assertAggregate(self):
+        """Сводный список каждого покупателя равен свежему Sum."""
+        for user in self.buyers:
+            expected = dict(RecipeIngredient.objects.filter(
+                recipe__shoppingcarts__user=user
+            ).values('ingredient').annotate(
+                total=Sum('amount')).values_list('ingredient', 'total'))
+            actual = dict(ShoppingListItem.objects.filter(
+                user=user).values_list('ingredient', 'total_amount'))
+            self.assertEqual(actual, expected, user.username)
+
+    def cart(self, user, recipe, method='post'):
+        """Добавляет рецепт в корзину или убирает из неё."""
+        self.client.force_authenticate(user)
+        response = getattr(self.client, method)(
+            f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cart_add_edit_and_delete(self):
+        """Добавление, правка ингредиентов, удаление из корзины и рецепта."""
+        for user in self.buyers:
+            for recipe in self.recipes:
+                self.cart(user, recipe)
+        self.assertAggregate()
+
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.recipes[0].id}/', {
+                'ingredients': [
+                    {'id': self.ingredients[1].id, 'amount': 7},
+                    {'id': self.ingredients[3].id, 'amount': 5},
+                ],
+                'tags': [self.tag.id],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertAggregate()
+
+        self.cart(self.buyers[0], self.recipes[1], 'delete')
+        self.assertAggregate()
+
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertAggregate()
+        self.assertFalse(ShoppingListItem.objects.filter(
+            user=self.buyers[0]).exists())
+
+    def test_download_uses_aggregate(self):
+        """Выгрузка списка покупок отдаёт суммы из агрегата."""
+        self.cart(self.buyers[0], self.recipes[0])
+        self.cart(self.buyers[0], self.recipes[1])
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        for item in ShoppingListItem.objects.filter(
+                user=self.buyers[0]).select_related('ingredient'):
+            self.assertIn(
+                f'- {item.ingredient.name} (г) - {item.total_amount}',
+                content)
@@ -0,0 +1,79 @@
+"""Короткие ссылки на рецепты."""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes import shortlinks
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class ShortLinkTest(APITestCase):
+    """Ссылка из get-link ведёт на свой рецепт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты с вычисляемой и с сохранённой ранее ссылкой."""
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password-123')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image=f'images/recipe-{number}.png')
+            for number in range(3)
+        ]
+        cls.legacy = Recipe.objects.create(
+            author=cls.author, name='Старый рецепт', text='Описание',
+            cooking_time=10, image='images/legacy.png', link='abc')
+
+    def setUp(self):
+        """Резолвер кэширует коды, кэш не должен переживать тест."""
+        cache.clear()
+
+    def follow(self, recipe):
+        """Код из get-link и ответ /s/<код>/."""
+        response = self.client.get(f'/api/recipes/{recipe.id}/get-link/')
+        self.assertEqual(response.status_code, 200)
+        url = response.json()['short-link']
+        self.assertTrue(url.startswith('http://testserver/s/'), url)
+        return self.client.get(url[len('http://testserver'):])
+
+    def test_round_trip(self):
+        """Каждая ссылка, в том числе сохранённая, ведёт на свой рецепт."""
+        for recipe in (*self.recipes, self.legacy):
+            with self.subTest(recipe=recipe.id):
+                for _ in range(2):
+                    response = self.follow(recipe)
+                    self.assertRedirects(
+                        response, f'/recipes/{recipe.id}/',
+                        fetch_redirect_response=False)
+
+    def test_codec(self):
+        """decode обращает encode, чужие коды не декодируются."""
+        for recipe_id in (1, 2, 62 ** 3, shortlinks.MODULUS - 1):
+            code = shortlinks.encode(recipe_id)
+            self.assertEqual(len(code), shortlinks.CODE_LENGTH)
+            self.assertEqual(shortlinks.decode(code), recipe_id)
+        self.assertIsNone(shortlinks.decode('abc'))
+        self.assertIsNone(shortlinks.decode('abc-de'))
+
+    def test_unknown_code(self):
+        """Код без рецепта даёт 404."""
+        missing = max(recipe.id for recipe in self.recipes) + 100
+        for code in (shortlinks.encode(missing), 'zzz'):
+            with self.subTest(code=code):
+                response = self.client.get(f'/s/{code}/')
+                self.assertEqual(response.status_code, 404)
+
+    def test_link_is_read_only(self):
+        """Автор не может задать ссылку, она остаётся вычисляемой."""
+        recipe = self.recipes[0]
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{recipe.id}/', {'link': 'custom'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        recipe.refresh_from_db()
+        self.assertIsNone(recipe.link)
+        self.assertEqual(recipe.short_link, shortlinks.encode(recipe.id))
@@ -1,8 +1,10 @@
 """URL-ы АPI."""
 from django.urls import include, path
+from .views import db_stats
 
 
 urlpatterns = [
+    path('db-stats/', db_stats, name='db-stats'),
     path('', include('api.recipes.urls')),
     path('', include('api.users.urls')),
 ]
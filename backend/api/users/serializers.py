@@ -3,9 +3,10 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from foodgram_backend.settings import MAX_LENGTH_EMAIL, MAX_LENGTH_USERNAME
+from recipes.images import variant_urls
 from users.models import Subscription
 from .validators import validate_username
-from drf_extra_fields.fields import Base64ImageField
+from api.fields import ImageUploadField
 
 User = get_user_model()
 
@@ -14,13 +15,18 @@ class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для базовой информации о пользователе."""
 
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    avatar_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         """Метаданные."""
 
         model = User
         fields = ('id', 'email', 'username', 'first_name',
-                  'last_name', 'is_subscribed', 'avatar')
+                  'last_name', 'is_subscribed', 'avatar', 'avatar_variants')
+
+    def get_avatar_variants(self, obj):
+        """Ссылки на уменьшенные копии аватара."""
+        return variant_urls(obj.avatar, self.context.get('request'))
 
     def get_is_subscribed(self, obj):
         """Проверяет, подписан ли текущий пользователь на этого."""
@@ -81,7 +87,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 class UserAvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для аватара пользователя."""
 
-    avatar = Base64ImageField()
+    avatar = ImageUploadField()
 
     class Meta:
         """Метаданные."""
@@ -114,6 +120,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.IntegerField(read_only=True)
     avatar = serializers.SerializerMethodField(read_only=True)
+    avatar_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         """Метаданные."""
@@ -121,7 +128,8 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         model = Subscription
         fields = (
             'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'recipes', 'recipes_count', 'avatar')
+            'is_subscribed', 'recipes', 'recipes_count', 'avatar',
+            'avatar_variants')
 
     def get_is_subscribed(self, obj):
         """Получение подписки."""
@@ -130,7 +138,14 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     def get_recipes(self, obj):
         """Метод для получения рецептов подписанного пользователя."""
         from api.recipes.serializers import RecipeShortSerializer
-        recipes = obj.subscribed_to.recipes.all()
+        from api.utils import get_latest_recipes, get_recipes_limit
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is None:
+            request = self.context.get('request')
+            limit = get_recipes_limit(request) if request else None
+            recipes_by_author = get_latest_recipes(
+                [obj.subscribed_to_id], limit)
+        recipes = recipes_by_author.get(obj.subscribed_to_id, [])
         return RecipeShortSerializer(
             recipes, many=True, context=self.context
         ).data
@@ -141,6 +156,11 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             return obj.subscribed_to.avatar.url
         return None
 
+    def get_avatar_variants(self, obj):
+        """Ссылки на уменьшенные копии аватара."""
+        return variant_urls(
+            obj.subscribed_to.avatar, self.context.get('request'))
+
 
 class AddFollowSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления подписок."""
@@ -166,6 +186,6 @@ class AddFollowSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         """Возвращает сериализованные данные подписки."""
-        instance.recipes_count = instance.subscribed_to.recipes.count()
+        instance.recipes_count = instance.subscribed_to.recipes_count
         serializer = SubscriptionSerializer(instance, context=self.context)
         return serializer.data
@@ -1,13 +1,13 @@
 """Вьюсеты для работы с пользователями."""
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
+from django.db.models import F
 from rest_framework.response import Response
 from rest_framework.permissions import (
     IsAuthenticated, AllowAny)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from api.utils import delete_relation
+from api.utils import delete_relation, get_latest_recipes, get_recipes_limit
 from api.pagination import RecipePagination
 from .serializers import (
     UserSerializer, UserRegistrationSerializer,
@@ -64,13 +64,21 @@ class UsersViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated])
     def user_subscription(self, request):
         """Получение списка подписок пользователя."""
-        subscribers = request.user.subscriber.annotate(
-            recipes_count=Count('subscribed_to__recipes'))
+        subscribers = request.user.subscriber.select_related(
+            'subscribed_to'
+        ).annotate(
+            recipes_count=F('subscribed_to__recipes_count')
+        ).order_by('id')
         paginator = self.pagination_class()
         paginated_subscribers = paginator.paginate_queryset(
             subscribers, request)
+        recipes = get_latest_recipes(
+            [subscription.subscribed_to_id
+             for subscription in paginated_subscribers],
+            get_recipes_limit(request))
         serializer = SubscriptionSerializer(
-            paginated_subscribers, many=True, context={'request': request}
+            paginated_subscribers, many=True,
+            context={'request': request, 'recipes_by_author': recipes}
         )
         return paginator.get_paginated_response(serializer.data)
 
@@ -83,7 +91,7 @@ class UsersViewSet(viewsets.ModelViewSet):
         serializer = AddFollowSerializer(data={
             'subscribed_to': user_to_subscribe.id,
             'user': request.user.id
-        })
+        }, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
@@ -1,8 +1,35 @@
 """Утилиты для API."""
+import csv
+import hashlib
+import json
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status
-from recipes.models import RecipeIngredient
+from recipes import shortlinks
+from recipes.cache import get_version, get_versions
+from recipes.ingredient_index import schedule_index_update
+from recipes.search import update_search_vectors
+from recipes.shopping_lists import replacing_ingredients
+from recipes.similarity import schedule_neighbours
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart)
+from users.models import Subscription
+
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPE_RESPONSE_CACHE_KEY = 'recipe-response:{}'
+RECIPE_RESPONSE_CACHE_TIMEOUT = 60 * 10
+RECIPE_RESPONSE_VERSIONS = ('recipes', 'tags', 'ingredients')
+
+SHOPPING_LIST_CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
 
 
 def add_to_relation(
@@ -35,17 +62,258 @@ def delete_relation(result_delete):
 
 def recipe_create_and_update(recipe, ingredients_data, tags_data):
     """Создание и обновление рецепта."""
-    if not recipe.link:
-        recipe.generate_link()
-        recipe.save()
     if tags_data:
         recipe.tags.set(tags_data)
     if ingredients_data:
-        recipe.recipeingredients.all().delete()
-        recipe.recipeingredients.bulk_create([
-            RecipeIngredient(
-                recipe=recipe, ingredient=ingredient['id'],
-                amount=ingredient['amount']
+        with replacing_ingredients(recipe.id):
+            recipe.recipeingredients.all().delete()
+            recipe.recipeingredients.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient['id'],
+                    amount=ingredient['amount']
+                )
+                for ingredient in ingredients_data
+            ])
+            Ingredient.objects.filter(pk__in=[
+                ingredient['id'].pk for ingredient in ingredients_data
+            ]).update(recipes_count=F('recipes_count') + 1)
+        schedule_index_update(recipe.id)
+    if ingredients_data or tags_data:
+        schedule_neighbours(recipe.id)
+    update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None."""
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """Последние рецепты авторов одним запросом: {author_id: [рецепты]}."""
+    queryset = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id', 'name', 'image', 'cooking_time', 'author_id', 'pub_date')
+    if limit is not None:
+        queryset = queryset.annotate(row_number=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc())
+        )).filter(row_number__lte=limit)
+    recipes = {author_id: [] for author_id in author_ids}
+    for recipe in queryset.order_by('author_id', '-pub_date', '-id'):
+        recipes[recipe.author_id].append(recipe)
+    return recipes
+
+
+def get_shopping_list(user):
+    """Суммарное количество ингредиентов из списка покупок."""
+    return user.shoppinglistitems.values(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).order_by('ingredient__name')
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        """Возвращает значение вместо записи."""
+        return value
+
+
+def shopping_list_txt(rows):
+    """Построчно формирует текстовый список покупок."""
+    yield "Список покупок:\n"
+    for row in rows:
+        yield (
+            f"- {row['ingredient__name']} "
+            f"({row['ingredient__measurement_unit']}) - "
+            f"{row['total_amount']}\n")
+
+
+def shopping_list_csv(rows):
+    """Построчно формирует список покупок в CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['ingredient__measurement_unit'],
+            row['total_amount']))
+
+
+def shopping_list_json(rows):
+    """Построчно формирует список покупок в JSON."""
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps({
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['total_amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+SHOPPING_LIST_WRITERS = {
+    'txt': shopping_list_txt,
+    'csv': shopping_list_csv,
+    'json': shopping_list_json,
+}
+
+
+def shopping_list_response(rows, filetype):
+    """Потоковый ответ со списком покупок в выбранном формате."""
+    response = StreamingHttpResponse(
+        SHOPPING_LIST_WRITERS[filetype](rows),
+        content_type=SHOPPING_LIST_CONTENT_TYPES[filetype])
+    response['Content-Disposition'] = (
+        f'attachment; filename="list.{filetype}"')
+    return response
+
+
+def resolve_short_link(code):
+    """Id рецепта по коду короткой ссылки через общий кэш."""
+    key = shortlinks.SHORT_LINK_CACHE_KEY.format(code)
+    recipe_id = cache.get(key)
+    if recipe_id is not None:
+        return recipe_id
+    decoded = shortlinks.decode(code)
+    if decoded is not None:
+        queryset = Recipe.objects.filter(pk=decoded)
+    else:
+        queryset = Recipe.objects.filter(link=code)
+    recipe_id = queryset.values_list('id', flat=True).first()
+    if recipe_id is not None:
+        cache.set(key, recipe_id, SHORT_LINK_CACHE_TIMEOUT)
+    return recipe_id
+
+
+def renderer_format(request):
+    """Формат ответа, выбранный при согласовании содержимого.
+
+    Входит в ETag: иначе клиент, получивший JSON, мог бы получить 304
+    на запрос MessagePack или браузерного API по тому же адресу.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', '')
+
+
+def catalog_etag(name):
+    """ETag справочника по его версии, формату и строке запроса."""
+    def etag_func(request, *args, **kwargs):
+        value = (
+            f'{get_version(name)}:{renderer_format(request)}:'
+            f'{request.get_full_path()}')
+        return hashlib.md5(value.encode('utf-8')).hexdigest()
+    return etag_func
+
+
+def parse_id(value):
+    """Целочисленный id из параметра адреса или None."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_recipe_state(request, pk):
+    """Даты изменения рецепта и автора и флаги пользователя.
+
+    Всё выбирается одним запросом. Для некорректного или
+    несуществующего id возвращается None, и представление отвечает 404.
+    """
+    if not hasattr(request, '_recipe_state'):
+        recipe_id = parse_id(pk)
+        if recipe_id is None:
+            request._recipe_state = None
+            return None
+        user = request.user
+        queryset = Recipe.objects.filter(pk=recipe_id)
+        flags = []
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                subscribed=Exists(Subscription.objects.filter(
+                    user=user, subscribed_to=OuterRef('author')))
             )
-            for ingredient in ingredients_data
-        ])
+            flags = ['favorited', 'in_shopping_cart', 'subscribed']
+        request._recipe_state = queryset.values_list(
+            'updated_at', 'author__updated_at', *flags).first()
+    return request._recipe_state
+
+
+def recipe_etag(request, pk=None):
+    """ETag рецепта с учётом автора, флагов пользователя и формата."""
+    state = get_recipe_state(request, pk)
+    if state is None:
+        return None
+    value = (
+        f'{state}:{request.user.id}:{renderer_format(request)}:'
+        f'{get_version("tags")}:{get_version("ingredients")}')
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def recipe_last_modified(request, pk=None):
+    """Дата изменения рецепта или его автора для анонимных пользователей."""
+    if request.user.is_authenticated:
+        return None
+    state = get_recipe_state(request, pk)
+    return max(state[:2]) if state else None
+
+
+def normalize_query(request, params, defaults=None):
+    """Значимые параметры запроса в каноническом виде.
+
+    Неизвестные параметры отбрасываются, значения по умолчанию не
+    учитываются, порядок параметров и повторяющихся значений не важен.
+    """
+    defaults = defaults or {}
+    query = []
+    for name in sorted(params):
+        values = sorted(
+            value for value in request.query_params.getlist(name)
+            if value != '')
+        if values and values != [defaults.get(name)]:
+            query.append((name, values))
+    return query
+
+
+def recipe_response_cache_key(request, query, *parts):
+    """Ключ кэша ответа с учётом поколений рецептов и справочников."""
+    value = json.dumps([
+        request.scheme, request.get_host(),
+        request.accepted_renderer.format, query,
+        get_versions(*RECIPE_RESPONSE_VERSIONS), *parts,
+    ])
+    return RECIPE_RESPONSE_CACHE_KEY.format(
+        hashlib.md5(value.encode('utf-8')).hexdigest())
+
+
+def cached_anonymous_response(request, get_key, handler, *args, **kwargs):
+    """Отдаёт готовый ответ анонимному пользователю из кэша.
+
+    Флаги избранного и списка покупок у анонима всегда False, поэтому
+    ответ одинаков для всех и хранится уже отрисованным.
+    """
+    if request.user.is_authenticated:
+        return handler(request, *args, **kwargs)
+    key = get_key()
+    if key is None:
+        return handler(request, *args, **kwargs)
+    cached = cache.get(key)
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    response = handler(request, *args, **kwargs)
+    if response.status_code == status.HTTP_200_OK:
+        response.add_post_render_callback(lambda rendered: cache.set(
+            key, (rendered.content, rendered['Content-Type']),
+            RECIPE_RESPONSE_CACHE_TIMEOUT))
+    return response
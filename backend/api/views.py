@@ -0,0 +1,23 @@
+"""Служебные представления API."""
+from django.db import connections
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from foodgram_backend.postgresql_pool.base import pool_stats
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_stats(request):
+    """Соединения и пул базы в воркере, обработавшем запрос."""
+    pools = pool_stats()
+    return Response({
+        alias: {
+            'engine': connections[alias].settings_dict['ENGINE'],
+            'conn_max_age': connections[alias].settings_dict['CONN_MAX_AGE'],
+            'connected': connections[alias].connection is not None,
+            'pool': pools.get(alias),
+        }
+        for alias in connections
+    })
@@ -0,0 +1 @@
+"""Бэкенд PostgreSQL с пулом соединений внутри процесса."""
@@ -0,0 +1,53 @@
+"""DatabaseWrapper, берущий соединения из пула процесса."""
+import os
+import threading
+
+from django.db.backends.postgresql import base
+
+from .pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """Пул для алиаса базы; после fork создаётся заново."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            options = settings_dict.get('POOL', {})
+            pool = ConnectionPool(
+                size=options.get('SIZE', 5),
+                max_overflow=options.get('MAX_OVERFLOW', 5),
+                timeout=options.get('TIMEOUT', 10.0),
+                check_idle=options.get('CHECK_IDLE', 30.0),
+            )
+            _pools[alias] = pool
+        return pool
+
+
+def pool_stats():
+    """Состояние пулов текущего процесса по алиасам баз."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL, где закрытие соединения возвращает его в пул.
+
+    Используется с CONN_MAX_AGE = 0: Django «закрывает» соединение в
+    конце запроса, а пул оставляет его открытым для следующего.
+    """
+
+    def get_new_connection(self, conn_params):
+        """Соединение из пула или новое."""
+        return get_pool(self.alias, self.settings_dict).acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                get_pool(self.alias, self.settings_dict).release(
+                    self.connection)
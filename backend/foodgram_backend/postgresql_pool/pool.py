@@ -0,0 +1,148 @@
+"""Пул соединений psycopg2 с переполнением и метриками."""
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Свободное соединение не появилось за отведённое время."""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений.
+
+    Держит до size простаивающих соединений и открывает ещё до
+    max_overflow сверх них; такие соединения закрываются при возврате.
+    Когда все заняты, запрос ждёт не дольше timeout секунд. Соединение,
+    простоявшее дольше check_idle секунд, перед выдачей проверяется
+    запросом SELECT 1.
+    """
+
+    def __init__(self, size=5, max_overflow=5, timeout=10.0,
+                 check_idle=30.0):
+        """Пустой пул, соединения открываются по требованию."""
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._opened = 0
+        self._condition = threading.Condition()
+        self._counters = {
+            'checkouts': 0,
+            'connections_created': 0,
+            'connections_closed': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+        }
+
+    def acquire(self, connect):
+        """Выдаёт соединение из пула или открывает новое через connect."""
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._condition:
+                while not self._idle and (
+                        self._opened >= self.size + self.max_overflow):
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            'Нет свободных соединений с базой за '
+                            f'{self.timeout} с.')
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                else:
+                    connection, released_at = None, None
+                    self._opened += 1
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self._forget()
+                    raise
+                self._record_checkout(started, waited, created=True)
+                return connection
+            if self._is_usable(connection, released_at):
+                self._record_checkout(started, waited)
+                return connection
+            self._discard(connection)
+
+    def release(self, connection):
+        """Возвращает соединение в пул или закрывает лишнее."""
+        if not connection.closed:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    connection.close()
+        with self._condition:
+            keep = (not connection.closed and self._opened <= self.size)
+            if keep:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+        if not keep:
+            self._discard(connection)
+
+    def stats(self):
+        """Текущее состояние и накопленные счётчики пула."""
+        with self._condition:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'idle': len(self._idle),
+                'in_use': self._opened - len(self._idle),
+                **self._counters,
+            }
+
+    def _is_usable(self, connection, released_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - released_at < self.check_idle:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _discard(self, connection):
+        if not connection.closed:
+            try:
+                connection.close()
+            except psycopg2.Error:
+                pass
+        with self._condition:
+            self._counters['connections_closed'] += 1
+        self._forget()
+
+    def _forget(self):
+        with self._condition:
+            self._opened -= 1
+            self._condition.notify()
+
+    def _record_checkout(self, started, waited, created=False):
+        with self._condition:
+            self._counters['checkouts'] += 1
+            if created:
+                self._counters['connections_created'] += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._counters['waits'] += 1
+                self._counters['wait_time_total'] += wait_time
+                self._counters['wait_time_max'] = max(
+                    self._counters['wait_time_max'], wait_time)
@@ -2,6 +2,7 @@
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from importlib.util import find_spec
 import os
 
 load_dotenv()
@@ -79,17 +80,66 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 #     }
 # }
 
+# Соединения с базой:
+# - по умолчанию постоянные (DB_CONN_MAX_AGE секунд) с проверкой перед
+#   повторным использованием;
+# - DB_POOL=true включает пул внутри процесса (DB_POOL_SIZE соединений
+#   плюс до DB_POOL_MAX_OVERFLOW сверх них, ожидание до DB_POOL_TIMEOUT);
+# - DB_PGBOUNCER=true - работа через pgbouncer в режиме transaction:
+#   серверные курсоры отключаются.
+DB_POOL = os.getenv('DB_POOL', '').lower() in ('1', 'true', 'yes')
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram_backend.postgresql_pool' if DB_POOL
+            else 'django.db.backends.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
         'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(
+            os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', 5)),
+            'MAX_OVERFLOW': int(os.getenv('DB_POOL_MAX_OVERFLOW', 5)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
     }
 }
 
+# Кэш общий для всех воркеров gunicorn: через него распространяются
+# версии справочников и другие инвалидации. В docker-compose это Redis
+# (CACHE_BACKEND/CACHE_LOCATION). Без настроек используется файловый
+# кэш в каталоге проекта, закрытом от других пользователей системы.
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, '.cache')),
+    },
+    # Кэш в памяти воркера для горячих данных с коротким временем жизни.
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-local',
+    },
+}
+
+# Файловый кэш при каждой записи перебирает каталог и, когда записей
+# больше MAX_ENTRIES, удаляет случайную 1/CULL_FREQUENCY часть.
+if CACHE_BACKEND.endswith('FileBasedCache'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        'CULL_FREQUENCY': int(os.getenv('CACHE_CULL_FREQUENCY', 10)),
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -120,7 +170,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 
     'DEFAULT_PERMISSION_CLASSES': [
@@ -129,8 +179,25 @@ REST_FRAMEWORK = {
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# MessagePack включается, только если установлен пакет msgpack.
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'api.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+        'api.parsers.MessagePackParser')
+
 STATIC_URL = '/static/'
 
 STATIC_ROOT = BASE_DIR / 'collected_static'
@@ -139,6 +206,21 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загружаемые файлы сразу пишутся во временный файл, а не в память воркера.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+# Рецепты авторов с большим числом подписчиков не раскладываются по
+# лентам при публикации, а подмешиваются при чтении.
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 5000))
+
+# Сколько последних записей хранить в ленте пользователя
+# (management-команда trim_feeds).
+FEED_MAX_ENTRIES = int(os.getenv('FEED_MAX_ENTRIES', 1000))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
 }
@@ -1,9 +1,49 @@
 """Админ-зона рецептов."""
+from contextlib import ExitStack
+
 from django.contrib import admin
+from django.contrib.auth import get_user_model
 from recipes.models import (
     ShoppingCart, Favorite, Ingredient, Recipe, RecipeIngredient, Tag
 )
 from django.utils.html import format_html
+from recipes.ingredient_index import schedule_index_update
+from recipes.search import update_search_vectors
+from recipes.shopping_lists import replacing_ingredients
+from recipes.similarity import schedule_neighbours
+
+User = get_user_model()
+
+
+class AuthorFilter(admin.SimpleListFilter):
+    """Фильтр по автору без загрузки всей таблицы пользователей.
+
+    Показывает самых активных авторов и выбранного, остальных
+    можно найти поиском по username.
+    """
+
+    title = 'Автор'
+    parameter_name = 'author'
+    limit = 20
+
+    def lookups(self, request, model_admin):
+        """Самые активные авторы и текущий выбранный."""
+        authors = User.objects.filter(recipes_count__gt=0).order_by(
+            '-recipes_count').values_list('id', 'username')[:self.limit]
+        lookups = [(str(pk), username) for pk, username in authors]
+        value = self.value()
+        if value and value not in {pk for pk, _ in lookups}:
+            selected = User.objects.filter(pk=value).values_list(
+                'id', 'username').first()
+            if selected:
+                lookups.append((str(selected[0]), selected[1]))
+        return lookups
+
+    def queryset(self, request, queryset):
+        """Рецепты выбранного автора."""
+        if self.value():
+            return queryset.filter(author_id=self.value())
+        return queryset
 
 
 @admin.register(Ingredient)
@@ -30,6 +70,11 @@ class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     min_num = 2
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        """Ингредиенты строк загружаются вместе с ними."""
+        return super().get_queryset(request).select_related('ingredient')
 
 
 @admin.register(RecipeIngredient)
@@ -37,6 +82,35 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     """Количество ингредиентов."""
 
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        """Сохраняет строку и обновляет списки покупок и индекс."""
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.add(form.initial.get('recipe'))
+        with ExitStack() as stack:
+            for recipe_id in recipe_ids:
+                stack.enter_context(replacing_ingredients(recipe_id))
+                schedule_index_update(recipe_id)
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        """Удаляет строку и обновляет списки покупок и индекс."""
+        with replacing_ingredients(obj.recipe_id):
+            super().delete_model(request, obj)
+        schedule_index_update(obj.recipe_id)
+
+    def delete_queryset(self, request, queryset):
+        """Удаляет строки и обновляет списки покупок и индекс."""
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        with ExitStack() as stack:
+            for recipe_id in recipe_ids:
+                stack.enter_context(replacing_ingredients(recipe_id))
+                schedule_index_update(recipe_id)
+            super().delete_queryset(request, queryset)
 
 
 @admin.register(Recipe)
@@ -44,15 +118,22 @@ class RecipeAdmin(admin.ModelAdmin):
     """Рецепт."""
 
     list_display = ('name', 'author', 'favorites_count', 'image_preview')
+    list_select_related = ('author',)
     search_fields = ('author__username', 'name', 'tags__name')
     filter_horizontal = ('tags',)
-    list_filter = ('tags', 'author')
+    list_filter = ('tags', AuthorFilter)
+    autocomplete_fields = ('author',)
+    readonly_fields = ('link',)
+    show_full_result_count = False
     inlines = (RecipeIngredientInline,)
 
-    @admin.display(description='В избранном')
-    def favorites_count(self, obj):
-        """В избранном."""
-        return obj.favorites.count()
+    def save_related(self, request, form, formsets, change):
+        """Обновляет списки покупок, поиск, индекс и похожие рецепты."""
+        with replacing_ingredients(form.instance.pk):
+            super().save_related(request, form, formsets, change)
+        schedule_index_update(form.instance.pk)
+        schedule_neighbours(form.instance.pk)
+        update_search_vectors(Recipe.objects.filter(pk=form.instance.pk))
 
     @admin.display(description='Картинка рецепта')
     def image_preview(self, obj):
@@ -71,6 +152,9 @@ class FavoriteAdmin(admin.ModelAdmin):
     """Избранные рецепты."""
 
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
@@ -78,3 +162,6 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     """Список покупок."""
 
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
@@ -8,3 +8,7 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        """Подключает сигналы."""
+        from recipes import signals  # noqa: F401
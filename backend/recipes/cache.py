@@ -0,0 +1,41 @@
+"""Версии данных для инвалидации кэшей и ETag."""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'data-version:{}'
+
+
+def get_version(name):
+    """Текущая версия набора данных."""
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Меняет версию набора данных после записи."""
+    cache.set(VERSION_KEY.format(name), uuid.uuid4().hex, None)
+
+
+def bump_version_on_commit(name):
+    """Меняет версию после фиксации транзакции.
+
+    Иначе параллельный запрос успеет закэшировать старые данные уже
+    под новой версией.
+    """
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def get_versions(*names):
+    """Текущие версии нескольких наборов одним запросом к кэшу."""
+    keys = [VERSION_KEY.format(name) for name in names]
+    found = cache.get_many(keys)
+    return tuple(
+        found.get(key) or get_version(name)
+        for key, name in zip(keys, names)
+    )
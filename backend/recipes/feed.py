@@ -0,0 +1,203 @@
+"""Лента рецептов авторов, на которых подписан пользователь."""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Count, Q
+
+from recipes.images import get_executor
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+FEED_BACKFILL_LIMIT = 100
+FEED_BATCH_SIZE = 1000
+
+
+def is_fanout_author(author_id):
+    """Раскладываются ли рецепты автора по лентам при публикации."""
+    return User.objects.filter(
+        pk=author_id, followers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def author_recipes(author_id):
+    """Ключи последних рецептов автора для заполнения лент."""
+    return list(Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list(
+            'id', 'pub_date')[:FEED_BACKFILL_LIMIT])
+
+
+def add_entries(user_ids, recipes):
+    """Добавляет рецепты в ленты пользователей пачками."""
+    entries = []
+    for user_id in user_ids:
+        for recipe_id, pub_date in recipes:
+            entries.append(FeedEntry(
+                user_id=user_id, recipe_id=recipe_id, pub_date=pub_date))
+        if len(entries) >= FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            entries = []
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out(recipe_id, author_id):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if not is_fanout_author(author_id):
+        return
+    pub_date = Recipe.objects.filter(pk=recipe_id).values_list(
+        'pub_date', flat=True).first()
+    if pub_date is None:
+        return
+    subscriber_ids = Subscription.objects.filter(
+        subscribed_to_id=author_id).values_list('user_id', flat=True)
+    add_entries(
+        subscriber_ids.iterator(chunk_size=FEED_BATCH_SIZE),
+        [(recipe_id, pub_date)])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние рецепты нового автора.
+
+    Задача выполняется в фоне, поэтому подписка проверяется заново:
+    пользователь мог успеть отписаться.
+    """
+    if not is_fanout_author(author_id) or not Subscription.objects.filter(
+            user_id=user_id, subscribed_to_id=author_id).exists():
+        return
+    add_entries([user_id], author_recipes(author_id))
+
+
+def backfill_followers(author_id):
+    """Заполняет ленты всех подписчиков автора.
+
+    Нужно, когда число подписчиков опустилось до FEED_FANOUT_LIMIT:
+    пока их было больше, рецепты автора читались напрямую и в ленты не
+    попадали.
+    """
+    if not is_fanout_author(author_id):
+        return
+    subscriber_ids = Subscription.objects.filter(
+        subscribed_to_id=author_id).values_list('user_id', flat=True)
+    add_entries(
+        subscriber_ids.iterator(chunk_size=FEED_BATCH_SIZE),
+        author_recipes(author_id))
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки.
+
+    Если пользователь успел подписаться снова, лента не меняется.
+    """
+    if Subscription.objects.filter(
+            user_id=user_id, subscribed_to_id=author_id).exists():
+        return
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+def _run_safely(task, *args):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception(
+            'Не удалось обновить ленты: %s%s', task.__name__, args)
+    finally:
+        connections.close_all()
+
+
+def schedule(task, *args):
+    """Ставит обновление лент в фоновый пул после фиксации транзакции.
+
+    Раскладка по тысячам лент не задерживает ответ на запрос записи.
+    """
+    transaction.on_commit(
+        lambda: get_executor().submit(_run_safely, task, *args))
+
+
+def schedule_fan_out(recipe_id, author_id):
+    """Раскладывает рецепт по лентам после фиксации транзакции."""
+    schedule(fan_out, recipe_id, author_id)
+
+
+def read_authors(user):
+    """Подзапрос: авторы из подписок, чьи рецепты читаются напрямую."""
+    return user.subscriber.filter(
+        subscribed_to__followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values('subscribed_to')
+
+
+def feed_filter(user):
+    """Условие на рецепты ленты пользователя.
+
+    Рецепты обычных авторов берутся из таблицы ленты, рецепты авторов
+    с числом подписчиков больше FEED_FANOUT_LIMIT - напрямую по автору.
+    """
+    return (
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('recipe'))
+        | Q(author_id__in=read_authors(user))
+    )
+
+
+def keyset(queryset, id_field, position, reverse):
+    """Выборка по ключу (pub_date, id_field) от позиции.
+
+    Без reverse - по убыванию ключа после позиции, с reverse - по
+    возрастанию до неё.
+    """
+    if reverse:
+        queryset = queryset.order_by('pub_date', id_field)
+    else:
+        queryset = queryset.order_by('-pub_date', f'-{id_field}')
+    if position is None:
+        return queryset
+    pub_date, pk = position
+    lookup = 'gt' if reverse else 'lt'
+    return queryset.filter(
+        Q(**{f'pub_date__{lookup}': pub_date})
+        | Q(pub_date=pub_date, **{f'{id_field}__{lookup}': pk})
+    )
+
+
+def timeline_keys(user, position=None, reverse=False, limit=10):
+    """Ключи (pub_date, id) рецептов ленты от позиции курсора.
+
+    Записи ленты читаются по индексу (user, -pub_date, -recipe),
+    рецепты авторов без раскладки - по автору. Из каждого источника
+    берётся не больше limit ключей, затем они сливаются.
+    """
+    sources = (
+        keyset(FeedEntry.objects.filter(user=user), 'recipe_id',
+               position, reverse).values_list('pub_date', 'recipe_id'),
+        keyset(Recipe.objects.filter(author_id__in=read_authors(user)), 'id',
+               position, reverse).values_list('pub_date', 'id'),
+    )
+    keys = set()
+    for source in sources:
+        keys.update(source[:limit])
+    return sorted(keys, reverse=not reverse)[:limit]
+
+
+def trim_feeds(keep=None):
+    """Оставляет в каждой ленте не больше keep последних записей.
+
+    Возвращает число удалённых записей.
+    """
+    keep = settings.FEED_MAX_ENTRIES if keep is None else keep
+    user_ids = FeedEntry.objects.values('user').annotate(
+        total=Count('id')).filter(total__gt=keep).values_list(
+            'user', flat=True)
+    deleted = 0
+    for user_id in list(user_ids):
+        entries = FeedEntry.objects.filter(user_id=user_id)
+        pub_date, recipe_id = keyset(
+            entries, 'recipe_id', None, False
+        ).values_list('pub_date', 'recipe_id')[keep - 1]
+        deleted += keyset(
+            entries, 'recipe_id', (pub_date, recipe_id), False
+        ).order_by().delete()[0]
+    return deleted
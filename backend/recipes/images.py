@@ -0,0 +1,184 @@
+"""Уменьшенные копии загруженных картинок."""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipes.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZES = {
+    'small': 160,
+    'medium': 480,
+    'large': 1024,
+}
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANTS_READY_KEY = 'image-variants:{}'
+VARIANTS_READY_TIMEOUT = 60
+
+_executor = None
+
+
+def variant_name(name, size, image_format):
+    """Путь к копии картинки заданного размера и формата."""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return os.path.join(
+        directory, 'variants', f'{stem}_{size}.{extension}')
+
+
+def variant_names(name):
+    """Все пути копий картинки."""
+    return [
+        variant_name(name, size, image_format)
+        for size in IMAGE_SIZES for image_format in IMAGE_FORMATS
+    ]
+
+
+def variants_ready(name):
+    """Созданы ли копии картинки.
+
+    Ответ кэшируется в памяти воркера на VARIANTS_READY_TIMEOUT секунд,
+    чтобы не проверять хранилище для каждой строки списка.
+    """
+    local = caches['local']
+    key = VARIANTS_READY_KEY.format(name)
+    ready = local.get(key)
+    if ready is None:
+        ready = all(
+            default_storage.exists(path) for path in variant_names(name))
+        local.set(key, ready, VARIANTS_READY_TIMEOUT)
+    return ready
+
+
+def variant_urls(field_file, request=None):
+    """Ссылки на копии картинки: {размер: {формат: url}}.
+
+    Принимает файл поля модели или имя файла в хранилище. Пока копии
+    не созданы, все ссылки ведут на исходную картинку.
+    """
+    if not field_file:
+        return None
+    name = getattr(field_file, 'name', field_file)
+    ready = variants_ready(name)
+    original = default_storage.url(name)
+    urls = {}
+    for size in IMAGE_SIZES:
+        urls[size] = {}
+        for image_format in IMAGE_FORMATS:
+            url = original
+            if ready:
+                url = default_storage.url(
+                    variant_name(name, size, image_format))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[size][image_format] = url
+    return urls
+
+
+def generate_variants(name, force=False):
+    """Создаёт копии картинки. Возвращает количество созданных файлов."""
+    names = variant_names(name)
+    if not force and all(default_storage.exists(path) for path in names):
+        return 0
+    with default_storage.open(name, 'rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    created = 0
+    for size, side in IMAGE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((side, side), Image.LANCZOS)
+        for image_format, (pil_format, params) in IMAGE_FORMATS.items():
+            converted = resized
+            if pil_format == 'JPEG' and resized.mode != 'RGB':
+                converted = Image.new('RGB', resized.size, 'white')
+                rgba = resized.convert('RGBA')
+                converted.paste(rgba, mask=rgba.getchannel('A'))
+            buffer = io.BytesIO()
+            converted.save(buffer, pil_format, **params)
+            path = variant_name(name, size, image_format)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+            created += 1
+    return created
+
+
+def delete_variants(name):
+    """Удаляет копии картинки."""
+    caches['local'].delete(VARIANTS_READY_KEY.format(name))
+    for path in variant_names(name):
+        if default_storage.exists(path):
+            default_storage.delete(path)
+
+
+def stored_name(instance, field_name):
+    """Имя файла в поле строки instance до сохранения."""
+    if instance._state.adding:
+        return ''
+    return type(instance)._default_manager.filter(
+        pk=instance.pk).values_list(field_name, flat=True).first() or ''
+
+
+def _generate_safely(name, owners):
+    try:
+        if generate_variants(name) and owners is not None:
+            owners.update(updated_at=timezone.now())
+            bump_version('recipes')
+        caches['local'].set(
+            VARIANTS_READY_KEY.format(name), True, VARIANTS_READY_TIMEOUT)
+    except Exception:
+        logger.exception('Не удалось создать копии картинки %s', name)
+    finally:
+        connections.close_all()
+
+
+def _delete_safely(name):
+    try:
+        delete_variants(name)
+    except Exception:
+        logger.exception('Не удалось удалить копии картинки %s', name)
+
+
+def get_executor():
+    """Пул потоков для фоновых задач в текущем процессе.
+
+    Кроме копий картинок в нём пересчитываются похожие рецепты.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='background')
+    return _executor
+
+
+def schedule_variants(name, owners=None):
+    """Ставит создание копий в пул после фиксации транзакции.
+
+    owners - queryset строк с этой картинкой: когда копии готовы, у них
+    обновляется updated_at, чтобы ETag и кэш ответов сменились вместе
+    со ссылками на копии.
+    """
+    transaction.on_commit(
+        lambda: get_executor().submit(_generate_safely, name, owners))
+
+
+def schedule_variants_cleanup(name):
+    """Ставит удаление копий в пул после фиксации транзакции."""
+    transaction.on_commit(
+        lambda: get_executor().submit(_delete_safely, name))
@@ -0,0 +1,287 @@
+"""Инвертированный индекс ингредиент -> рецепты в памяти процесса."""
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+
+from recipes.cache import get_version
+from recipes.models import RecipeIngredient
+
+INDEX_VERSION = 'recipe-ingredients'
+CHANGES_SEQUENCE_KEY = 'recipe-ingredients:sequence'
+CHANGES_KEY = 'recipe-ingredients:change:{}'
+CHANGES_TIMEOUT = 60 * 60
+
+
+def make_bitmap(ids):
+    """Битовая карта из набора id: бит с номером id установлен."""
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for item_id in ids:
+        bits[item_id >> 3] |= 1 << (item_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def iter_bits(bitmap):
+    """Номера установленных битов карты по возрастанию."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+def journal_enabled():
+    """Можно ли вести журнал изменений в общем кэше.
+
+    Номер записи выдаёт cache.incr, атомарный между процессами только в
+    Redis и Memcached. С другими бэкендами номера могут совпасть, и
+    индекс пропустит изменение, поэтому он не используется.
+    """
+    return isinstance(caches['default'], (RedisCache, BaseMemcachedCache))
+
+
+def record_change(recipe_id):
+    """Записывает изменённый рецепт в общий журнал индекса."""
+    try:
+        sequence = cache.incr(CHANGES_SEQUENCE_KEY)
+    except ValueError:
+        cache.add(CHANGES_SEQUENCE_KEY, 0, None)
+        sequence = cache.incr(CHANGES_SEQUENCE_KEY)
+    cache.set(CHANGES_KEY.format(sequence), recipe_id, CHANGES_TIMEOUT)
+
+
+def schedule_index_update(recipe_id):
+    """Записывает изменение рецепта после фиксации транзакции."""
+    if journal_enabled():
+        transaction.on_commit(lambda: record_change(recipe_id))
+
+
+class SlotSet:
+    """Множество номеров слотов рецептов.
+
+    Как контейнеры roaring bitmap: пока элементов мало, они хранятся
+    массивом по 4 байта, когда массив становится больше битовой карты
+    на все слоты - картой. Память растёт с числом связей, а не с
+    произведением числа ингредиентов на максимальный id рецепта.
+    """
+
+    __slots__ = ('_items', '_bits')
+
+    def __init__(self, slots=(), capacity=0):
+        """Множество из слотов при заданном числе слотов индекса."""
+        self._items = array('I', slots)
+        self._bits = None
+        self._compact(capacity)
+
+    def __bool__(self):
+        """Есть ли в множестве элементы."""
+        if self._bits is not None:
+            return bool(self._bits)
+        return bool(self._items)
+
+    def _compact(self, capacity):
+        if self._bits is None and len(self._items) * 32 > capacity:
+            self._bits = make_bitmap(self._items)
+            self._items = None
+
+    def add(self, slot, capacity):
+        """Добавляет слот."""
+        if self._bits is not None:
+            self._bits |= 1 << slot
+            return
+        self._items.append(slot)
+        self._compact(capacity)
+
+    def discard(self, slot):
+        """Убирает слот, если он есть."""
+        if self._bits is not None:
+            self._bits &= ~(1 << slot)
+        elif slot in self._items:
+            self._items.remove(slot)
+
+    def bitmap(self):
+        """Множество в виде битовой карты."""
+        if self._bits is not None:
+            return self._bits
+        return make_bitmap(self._items)
+
+
+class IngredientIndex:
+    """Множества рецептов по ингредиентам и по размеру рецепта.
+
+    Рецепты нумеруются плотными слотами, освободившиеся слоты
+    используются повторно. Для каждого ингредиента хранится множество
+    рецептов, в которых он используется, и для каждого размера
+    рецепта - множество рецептов с таким числом ингредиентов.
+
+    Изменения рецептов пишутся в журнал в общем кэше. Раз в
+    check_interval секунд воркер дочитывает журнал и перестраивает
+    только изменённые рецепты. Полная загрузка нужна при старте, при
+    смене версии 'recipe-ingredients' и если журнал потерян или
+    отстал больше чем на max_delta записей.
+    """
+
+    check_interval = 5.0
+    max_delta = 1000
+
+    def __init__(self):
+        """Пустой индекс, загружается при первом обращении."""
+        self._lock = threading.Lock()
+        self._version = None
+        self._sequence = 0
+        self._checked_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._slots = {}
+        self._recipe_ids = array('q')
+        self._free_slots = []
+        self._ingredients = {}
+        self._by_ingredient = {}
+        self._by_size = {}
+
+    def invalidate(self):
+        """Сверить журнал при следующем обращении."""
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        version = get_version(INDEX_VERSION)
+        sequence = cache.get(CHANGES_SEQUENCE_KEY, 0)
+        if (version != self._version or sequence < self._sequence
+                or sequence - self._sequence > self.max_delta):
+            self._build()
+        elif sequence > self._sequence:
+            keys = [
+                CHANGES_KEY.format(number)
+                for number in range(self._sequence + 1, sequence + 1)
+            ]
+            changes = cache.get_many(keys)
+            if len(changes) < len(keys):
+                self._build()
+            else:
+                self._apply(set(changes.values()))
+        self._version = version
+        self._sequence = sequence
+        self._checked_at = now
+
+    def _build(self):
+        self._reset()
+        ingredients = defaultdict(list)
+        rows = RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id').iterator(chunk_size=10000)
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].append(ingredient_id)
+        slots_by_ingredient = defaultdict(list)
+        slots_by_size = defaultdict(list)
+        for slot, (recipe_id, ingredient_ids) in enumerate(
+                ingredients.items()):
+            self._slots[recipe_id] = slot
+            self._recipe_ids.append(recipe_id)
+            self._ingredients[recipe_id] = tuple(ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                slots_by_ingredient[ingredient_id].append(slot)
+            slots_by_size[len(ingredient_ids)].append(slot)
+        capacity = len(self._recipe_ids)
+        self._by_ingredient = {
+            ingredient_id: SlotSet(slots, capacity)
+            for ingredient_id, slots in slots_by_ingredient.items()
+        }
+        self._by_size = {
+            size: SlotSet(slots, capacity)
+            for size, slots in slots_by_size.items()
+        }
+
+    def _apply(self, recipe_ids):
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids).values_list(
+                    'recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id in recipe_ids:
+            self._remove(recipe_id)
+            if ingredients[recipe_id]:
+                self._add(recipe_id, tuple(ingredients[recipe_id]))
+
+    @staticmethod
+    def _discard(sets, key, slot):
+        slot_set = sets.get(key)
+        if slot_set is None:
+            return
+        slot_set.discard(slot)
+        if not slot_set:
+            del sets[key]
+
+    def _remove(self, recipe_id):
+        slot = self._slots.pop(recipe_id, None)
+        if slot is None:
+            return
+        ingredient_ids = self._ingredients.pop(recipe_id)
+        for ingredient_id in ingredient_ids:
+            self._discard(self._by_ingredient, ingredient_id, slot)
+        self._discard(self._by_size, len(ingredient_ids), slot)
+        self._recipe_ids[slot] = 0
+        self._free_slots.append(slot)
+
+    def _add(self, recipe_id, ingredient_ids):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._recipe_ids[slot] = recipe_id
+        else:
+            slot = len(self._recipe_ids)
+            self._recipe_ids.append(recipe_id)
+        capacity = len(self._recipe_ids)
+        self._slots[recipe_id] = slot
+        self._ingredients[recipe_id] = ingredient_ids
+        for ingredient_id in ingredient_ids:
+            self._by_ingredient.setdefault(
+                ingredient_id, SlotSet()).add(slot, capacity)
+        self._by_size.setdefault(
+            len(ingredient_ids), SlotSet()).add(slot, capacity)
+
+    def match(self, ingredient_ids, max_missing=0):
+        """Рецепты из имеющихся ингредиентов: {id: (совпало, всего)}.
+
+        Попадают рецепты, в которых не хватает не больше max_missing
+        ингредиентов и есть хотя бы один из имеющихся. Число совпадений
+        считается побитовым сумматором по картам ингредиентов, поэтому
+        запрос не зависит от числа строк RecipeIngredient.
+        """
+        with self._lock:
+            self._refresh()
+            planes = []
+            for ingredient_id in set(ingredient_ids):
+                slot_set = self._by_ingredient.get(ingredient_id)
+                carry = slot_set.bitmap() if slot_set else 0
+                for level, plane in enumerate(planes):
+                    if not carry:
+                        break
+                    planes[level], carry = plane ^ carry, plane & carry
+                if carry:
+                    planes.append(carry)
+            matches = {}
+            for size, slot_set in self._by_size.items():
+                recipes = slot_set.bitmap()
+                for missing in range(min(max_missing, size - 1) + 1):
+                    matched = size - missing
+                    if matched >> len(planes):
+                        continue
+                    mask = recipes
+                    for level, plane in enumerate(planes):
+                        mask &= plane if matched >> level & 1 else ~plane
+                    for slot in iter_bits(mask):
+                        matches[self._recipe_ids[slot]] = (matched, size)
+            return matches
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,49 @@
+"""Создание уменьшенных копий для уже загруженных картинок."""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Создаёт копии картинок рецептов и аватаров."""
+
+    help = 'Создаёт уменьшенные копии картинок рецептов и аватаров.'
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать существующие копии')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Количество потоков')
+
+    def handle(self, *args, **options):
+        """Обходит все картинки и создаёт недостающие копии."""
+        names = list(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        ) + list(
+            User.objects.exclude(avatar='').exclude(avatar__isnull=True)
+            .values_list('avatar', flat=True)
+        )
+
+        def process(name):
+            try:
+                return generate_variants(name, force=options['force']), None
+            except Exception as error:
+                return 0, f'{name}: {error}'
+
+        created = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for count, error in pool.map(process, names):
+                created += count
+                if error:
+                    failed += 1
+                    self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(names)}, создано копий: {created}, '
+            f'ошибок: {failed}.'))
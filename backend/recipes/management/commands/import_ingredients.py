@@ -1,7 +1,71 @@
-import json
 import csv
-from django.core.management.base import BaseCommand
-from recipes.models import Ingredient
+import io
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.cache import bump_version
+from recipes.models import Ingredient, normalize_name
+
+CSV_FIELDS = ('name', 'measurement_unit')
+COPY_FIELDS = ('name', 'measurement_unit', 'normalized_name')
+COPY_DEFAULTS = {'recipes_count': '0'}
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(file):
+    """Построчно читает CSV с заголовком или без него."""
+    for row in csv.reader(file):
+        if not row or tuple(row[:2]) == CSV_FIELDS:
+            continue
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def iter_json(file):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if buffer.startswith('['):
+                buffer = buffer[1:]
+                started = True
+                continue
+        elif buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        elif buffer.startswith(']'):
+            return
+        elif buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+        if eof:
+            raise CommandError('Файл JSON должен содержать массив объектов.')
+        chunk = file.read(JSON_CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def batched(iterable, size):
+    """Разбивает поток на списки по size элементов."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Command(BaseCommand):
@@ -13,29 +77,131 @@ class Command(BaseCommand):
         parser.add_argument('--filetype', type=str,
                             choices=['json', 'csv'],
                             default='json', help='Тип файла: json или csv')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество строк в одной пачке')
+        parser.add_argument('--update', action='store_true',
+                            help='Обновлять единицы измерения '
+                                 'существующих ингредиентов')
+        parser.add_argument('--copy', action='store_true',
+                            help='Загрузка через COPY (только PostgreSQL)')
 
     def handle(self, *args, **options):
-        file_path = options['file_path']
-        filetype = options['filetype']
-
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy доступен только для PostgreSQL.')
+        reader = iter_json if options['filetype'] == 'json' else iter_csv
+        started = time.monotonic()
         try:
-            if filetype == 'json':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                for item in data:
-                    Ingredient.objects.create(name=item['name'],
-                                              measurement_unit=item[
-                                                  'measurement_unit'])
-
-            elif filetype == 'csv':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        Ingredient.objects.create(name=row['name'],
-                                                  measurement_unit=row[
-                                                      'measurement_unit'])
-
-            self.stdout.write(self.style.SUCCESS(
-                'Ингредиенты успешно импортированы.'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ошибка импорта: {e}'))
+            with open(options['file_path'], 'r', encoding='utf-8') as file:
+                rows = self.clean_rows(reader(file))
+                if options['copy']:
+                    stats = self.import_copy(rows, options)
+                else:
+                    stats = self.import_bulk(rows, options)
+        except (OSError, ValueError, KeyError, IndexError) as error:
+            raise CommandError(f'Ошибка импорта: {error}')
+        elapsed = time.monotonic() - started
+
+        if stats['inserted'] or stats['updated']:
+            bump_version('ingredients')
+        total = sum(stats.values())
+        self.stdout.write(self.style.SUCCESS(
+            'Ингредиенты успешно импортированы. '
+            f'Добавлено: {stats["inserted"]}, '
+            f'обновлено: {stats["updated"]}, '
+            f'пропущено: {stats["skipped"]}. '
+            f'{total} строк за {elapsed:.2f} с '
+            f'({total / elapsed if elapsed else total:.0f} строк/с).'))
+
+    def clean_rows(self, rows):
+        """Обрезает пробелы и добавляет нормализованное название."""
+        for row in rows:
+            name = row['name'].strip()
+            yield {
+                'name': name,
+                'measurement_unit': row['measurement_unit'].strip(),
+                'normalized_name': normalize_name(name),
+            }
+
+    def import_bulk(self, rows, options):
+        """Импорт пачками через bulk_create/bulk_update."""
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        for batch in batched(rows, options['batch_size']):
+            unique = {}
+            for row in batch:
+                unique.setdefault(row['name'], row)
+            stats['skipped'] += len(batch) - len(unique)
+            existing = {
+                ingredient.name: ingredient
+                for ingredient in Ingredient.objects.filter(
+                    name__in=unique).only('id', 'name', 'measurement_unit')
+            }
+            to_create = []
+            to_update = []
+            for name, row in unique.items():
+                ingredient = existing.get(name)
+                if ingredient is None:
+                    to_create.append(Ingredient(**row))
+                elif (options['update'] and ingredient.measurement_unit
+                        != row['measurement_unit']):
+                    ingredient.measurement_unit = row['measurement_unit']
+                    to_update.append(ingredient)
+                else:
+                    stats['skipped'] += 1
+            with transaction.atomic():
+                created = Ingredient.objects.bulk_create(
+                    to_create, ignore_conflicts=True)
+                Ingredient.objects.bulk_update(
+                    to_update, ['measurement_unit'])
+            stats['inserted'] += len(created)
+            stats['updated'] += len(to_update)
+        return stats
+
+    def import_copy(self, rows, options):
+        """Импорт через COPY во временную таблицу и INSERT ON CONFLICT.
+
+        Столбцы без значения по умолчанию в базе (COPY_DEFAULTS)
+        заполняются в INSERT явно: default модели знает только Django.
+        """
+        table = Ingredient._meta.db_table
+        if options['update']:
+            conflict = (
+                'DO UPDATE SET measurement_unit = EXCLUDED.measurement_unit '
+                f'WHERE {table}.measurement_unit '
+                '<> EXCLUDED.measurement_unit')
+        else:
+            conflict = 'DO NOTHING'
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import ('
+                'position serial, name varchar(150), '
+                'measurement_unit varchar(50), normalized_name varchar(150)'
+                ') ON COMMIT DROP')
+            for batch in batched(rows, options['batch_size']):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in batch:
+                    writer.writerow([row[field] for field in COPY_FIELDS])
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY ingredient_import ({", ".join(COPY_FIELDS)}) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer)
+                total += len(batch)
+            columns = ', '.join((*COPY_FIELDS, *COPY_DEFAULTS))
+            values = ', '.join((*COPY_FIELDS, *COPY_DEFAULTS.values()))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON (name) {values} '
+                'FROM ingredient_import ORDER BY name, position '
+                f'ON CONFLICT (name) {conflict} '
+                'RETURNING (xmax = 0)')
+            results = [inserted for inserted, in cursor.fetchall()]
+        inserted = sum(results)
+        updated = len(results) - inserted
+        return {
+            'inserted': inserted,
+            'updated': updated,
+            'skipped': total - inserted - updated,
+        }
@@ -0,0 +1,59 @@
+"""Проверка и восстановление сводных списков покупок."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+
+class Command(BaseCommand):
+    """Пересчитывает ShoppingListItem по ShoppingCart и RecipeIngredient."""
+
+    help = 'Проверяет и исправляет сводные списки покупок.'
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('--check', action='store_true',
+                            help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        """Сравнивает сводную таблицу с расчётом по корзинам."""
+        expected = {
+            (row['recipe__shoppingcarts__user'], row['ingredient']):
+            row['total']
+            for row in RecipeIngredient.objects.filter(
+                recipe__shoppingcarts__isnull=False
+            ).values('recipe__shoppingcarts__user', 'ingredient').annotate(
+                total=Sum('amount')
+            ).order_by().iterator()
+        }
+        to_update = []
+        to_delete = []
+        for item in ShoppingListItem.objects.only(
+                'id', 'user_id', 'ingredient_id', 'total_amount').iterator():
+            total = expected.pop((item.user_id, item.ingredient_id), None)
+            if total is None:
+                to_delete.append(item.id)
+            elif total != item.total_amount:
+                item.total_amount = total
+                to_update.append(item)
+        to_create = [
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=total)
+            for (user_id, ingredient_id), total in expected.items()
+        ]
+
+        self.stdout.write(
+            f'Отсутствует: {len(to_create)}, '
+            f'неверное количество: {len(to_update)}, '
+            f'лишние: {len(to_delete)}.')
+        if options['check'] or not (to_create or to_update or to_delete):
+            return
+
+        with transaction.atomic():
+            ShoppingListItem.objects.filter(id__in=to_delete).delete()
+            ShoppingListItem.objects.bulk_update(
+                to_update, ['total_amount'], batch_size=1000)
+            ShoppingListItem.objects.bulk_create(to_create, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            'Сводные списки покупок исправлены.'))
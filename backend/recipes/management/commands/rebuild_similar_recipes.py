@@ -0,0 +1,23 @@
+"""Пересчёт похожих рецептов."""
+from django.core.management.base import BaseCommand
+from recipes.similarity import NEIGHBOURS_LIMIT, rebuild_neighbours
+
+
+class Command(BaseCommand):
+    """Заполняет таблицу похожих рецептов заново."""
+
+    help = 'Пересчитывает похожие рецепты для всего каталога.'
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('--limit', type=int, default=NEIGHBOURS_LIMIT,
+                            help='Сколько похожих рецептов хранить')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Размер пачки при записи')
+
+    def handle(self, *args, **options):
+        """Пересчитывает таблицу и печатает итог."""
+        written = rebuild_neighbours(
+            limit=options['limit'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано пар похожих рецептов: {written}.'))
@@ -0,0 +1,54 @@
+"""Сверка денормализованных счётчиков."""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Ingredient, Recipe, RecipeIngredient
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def count_subquery(model, field):
+    """Количество строк model, ссылающихся на объект через field."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Ingredient, 'recipes_count', RecipeIngredient, 'ingredient'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'subscribed_to'),
+    (User, 'following_count', Subscription, 'user'),
+)
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованные счётчики моделей."""
+
+    help = 'Проверяет и исправляет денормализованные счётчики.'
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('--check', action='store_true',
+                            help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        """Сверяет каждый счётчик с фактическим количеством."""
+        for model, field, source, source_field in COUNTERS:
+            actual = count_subquery(source, source_field)
+            drifted = model.objects.annotate(actual=actual).exclude(
+                **{field: F('actual')})
+            if options['check']:
+                fixed = drifted.count()
+            else:
+                fixed = model.objects.filter(
+                    pk__in=drifted.values('pk')
+                ).update(**{field: actual})
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: '
+                f'расхождений {fixed}.')
@@ -0,0 +1,25 @@
+"""Очистка старых записей лент подписок."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes.feed import trim_feeds
+
+
+class Command(BaseCommand):
+    """Удаляет записи лент сверх последних FEED_MAX_ENTRIES."""
+
+    help = ('Оставляет в каждой ленте подписок только последние записи. '
+            'Запускается по расписанию.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('--keep', type=int,
+                            default=settings.FEED_MAX_ENTRIES,
+                            help='Сколько записей оставить в каждой ленте')
+
+    def handle(self, *args, **options):
+        """Удаляет лишние записи и печатает итог."""
+        if options['keep'] < 1:
+            raise CommandError('--keep должен быть больше 0.')
+        deleted = trim_feeds(options['keep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей: {deleted}.'))
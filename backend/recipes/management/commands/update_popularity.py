@@ -0,0 +1,26 @@
+"""Пересчёт популярности рецептов."""
+from django.core.management.base import BaseCommand
+from recipes.popularity import HALF_LIFE_DAYS, update_popularity
+
+
+class Command(BaseCommand):
+    """Пересчитывает столбец popularity у рецептов."""
+
+    help = ('Пересчитывает популярность рецептов по избранному и списку '
+            'покупок с затуханием по времени. Запускается по расписанию.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Сколько рецептов обновлять за запрос')
+        parser.add_argument('--half-life', type=float,
+                            default=HALF_LIFE_DAYS,
+                            help='Период полураспада в днях')
+
+    def handle(self, *args, **options):
+        """Обновляет популярность и печатает итог."""
+        updated = update_popularity(
+            batch_size=options['batch_size'],
+            half_life=options['half_life'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}.'))
@@ -0,0 +1,19 @@
+"""Пересчёт поисковых векторов рецептов."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    """Пересчитывает search_vector у всех рецептов."""
+
+    help = 'Пересчитывает поисковые векторы рецептов (PostgreSQL).'
+
+    def handle(self, *args, **options):
+        """Обновляет векторы одним запросом."""
+        if connection.vendor != 'postgresql':
+            raise CommandError('Полнотекстовый поиск требует PostgreSQL.')
+        updated = update_search_vectors(Recipe.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}.'))
@@ -0,0 +1,50 @@
+"""Прогрев кэша анонимных списков рецептов."""
+from api.recipes.views import RecipeViewSet
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from recipes.registry import tag_registry
+
+
+class Command(BaseCommand):
+    """Запрашивает первые страницы главной и каждого тега."""
+
+    help = ('Заполняет кэш анонимных ответов для первых страниц '
+            'списка рецептов и каждого тега. Запускается после деплоя.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Сколько страниц прогревать')
+        parser.add_argument('--host', default=None,
+                            help='Хост, под которым сайт открывают клиенты')
+        parser.add_argument('--secure', action='store_true',
+                            help='Клиенты приходят по https')
+
+    def get_host(self, host):
+        """Хост из аргумента или первый явный из ALLOWED_HOSTS."""
+        if host:
+            return host
+        for allowed in settings.ALLOWED_HOSTS:
+            if allowed and '*' not in allowed and not allowed.startswith('.'):
+                return allowed
+        return 'localhost'
+
+    def handle(self, *args, **options):
+        """Отрисовывает страницы, ответы попадают в кэш."""
+        view = RecipeViewSet.as_view({'get': 'list'})
+        factory = RequestFactory(HTTP_HOST=self.get_host(options['host']))
+        filters = [{}] + [{'tags': tag['slug']} for tag in tag_registry.all()]
+        warmed = 0
+        for params in filters:
+            for page in range(1, options['pages'] + 1):
+                request = factory.get(
+                    '/api/recipes/', {**params, 'page': page},
+                    secure=options['secure'])
+                response = view(request)
+                response.render()
+                if response.status_code != 200:
+                    break
+                warmed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето страниц: {warmed}.'))
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:34
+
+from django.db import migrations, models
+
+
+def fill_normalized_name(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    ingredients = list(Ingredient.objects.only('id', 'name'))
+    for ingredient in ingredients:
+        ingredient.normalized_name = (
+            ingredient.name.strip().lower().replace('ё', 'е'))
+    Ingredient.objects.bulk_update(
+        ingredients, ['normalized_name'], batch_size=1000)
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_normalized_trgm '
+        'ON recipes_ingredient USING gin (normalized_name gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_normalized_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=150, verbose_name='Название для поиска'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['normalized_name'], name='ingredient_normalized_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(fill_normalized_name, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:42
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(**{field: models.OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=models.Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    Subscription = apps.get_model('users', 'Subscription')
+    Recipe.objects.update(
+        favorites_count=count_subquery(Favorite, 'recipe'))
+    UserProfile.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(Subscription, 'subscribed_to'),
+        following_count=count_subquery(Subscription, 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_updated_at'),
+        ('users', '0003_userprofile_followers_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
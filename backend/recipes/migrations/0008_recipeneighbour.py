@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Похожий рецепт')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'indexes': [models.Index(fields=['recipe', '-score'], name='recipe_neighbour_score')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeneighbour',
+            constraint=models.UniqueConstraint(fields=('recipe', 'neighbour'), name='unique_recipe_neighbour'),
+        ),
+    ]
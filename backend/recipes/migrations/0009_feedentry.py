@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    author_ids = Subscription.objects.filter(
+        subscribed_to__followers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).values_list('subscribed_to_id', flat=True).distinct()
+    for author_id in author_ids:
+        recipe_ids = list(Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id').values_list('id', flat=True)[:100])
+        user_ids = Subscription.objects.filter(
+            subscribed_to_id=author_id).values_list('user_id', flat=True)
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in recipe_ids
+        ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_recipeneighbour'),
+        ('users', '0003_userprofile_followers_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+                'default_related_name': 'feed_entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_feed_recipe'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
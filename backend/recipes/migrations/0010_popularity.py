@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_created_at(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    pub_date = models.Subquery(Recipe.objects.filter(
+        pk=models.OuterRef('recipe')).values('pub_date')[:1])
+    for model_name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('recipes', model_name).objects.filter(
+            created_at__isnull=True).update(created_at=pub_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Дата добавления'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Дата добавления'),
+        ),
+        migrations.RunPython(fill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-pub_date', '-id'], name='recipe_popularity'),
+        ),
+    ]
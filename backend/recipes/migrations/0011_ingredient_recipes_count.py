@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_count(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    Ingredient.objects.update(recipes_count=Coalesce(models.Subquery(
+        RecipeIngredient.objects.filter(ingredient=models.OuterRef('pk'))
+        .order_by().values('ingredient')
+        .annotate(total=models.Count('pk')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Используется в рецептах'),
+        ),
+        migrations.RunPython(fill_recipes_count, migrations.RunPython.noop),
+    ]
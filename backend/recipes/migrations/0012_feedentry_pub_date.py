@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+def fill_pub_date(apps, schema_editor):
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry.objects.update(pub_date=models.Subquery(
+        Recipe.objects.filter(pk=models.OuterRef('recipe')).values(
+            'pub_date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_ingredient_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(null=True, verbose_name='Дата публикации'),
+        ),
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+    ]
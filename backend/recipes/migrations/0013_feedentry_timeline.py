@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_feedentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(verbose_name='Дата публикации'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_entry_timeline'),
+        ),
+    ]
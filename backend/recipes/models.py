@@ -1,13 +1,20 @@
 """Модели рецептов."""
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from foodgram_backend.settings import MAX_LENGTH_USERNAME
-import uuid
+from recipes import shortlinks
 
 User = get_user_model()
 
 
+def normalize_name(value):
+    """Приводит название к виду для поиска: нижний регистр, ё -> е."""
+    return value.strip().lower().replace('ё', 'е')
+
+
 class PublishedModel(models.Model):
     """Базовая модель."""
 
@@ -15,6 +22,8 @@ class PublishedModel(models.Model):
         User, on_delete=models.CASCADE, verbose_name='Пользователь')
     recipe = models.ForeignKey(
         'Recipe', on_delete=models.CASCADE, verbose_name='Рецепт')
+    created_at = models.DateTimeField(
+        default=timezone.now, editable=False, verbose_name='Дата добавления')
 
     class Meta:
         """Мета данные."""
@@ -35,6 +44,15 @@ class Ingredient(models.Model):
         max_length=50,
         verbose_name='Единица измерения'
     )
+    normalized_name = models.CharField(
+        max_length=MAX_LENGTH_USERNAME,
+        editable=False,
+        default='',
+        verbose_name='Название для поиска'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='Используется в рецептах')
 
     class Meta:
         """Мета данные."""
@@ -47,12 +65,24 @@ class Ingredient(models.Model):
                 name='unique_name_measurement_unit'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['normalized_name'],
+                name='ingredient_normalized_prefix',
+                opclasses=['varchar_pattern_ops']
+            )
+        ]
         ordering = ('name',)
 
     def __str__(self):
         """Возвращает имя объекта в виде строки."""
         return f'{self.name}, {self.measurement_unit}'
 
+    def save(self, *args, **kwargs):
+        """Сохраняет нормализованное название вместе с объектом."""
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     """Тег."""
@@ -110,6 +140,16 @@ class Recipe(models.Model):
         verbose_name='Ссылка')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+    favorites_count = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False,
+        verbose_name='В избранном')
+    popularity = models.FloatField(
+        default=0, editable=False, verbose_name='Популярность')
+    search_vector = SearchVectorField(
+        null=True, editable=False,
+        verbose_name='Поисковый вектор')
     image = models.ImageField(upload_to='images/', verbose_name='Картинка')
     text = models.TextField(verbose_name='Описание')
 
@@ -120,16 +160,20 @@ class Recipe(models.Model):
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-popularity', '-pub_date', '-id'],
+                name='recipe_popularity'),
+        ]
 
     def __str__(self):
         """Возвращает имя объекта в виде строки."""
         return self.name
 
-    def generate_link(self):
-        """Генерация ссылки."""
-        self.link = uuid.uuid4().hex[:5]
-        while Recipe.objects.filter(link=self.link).exists():
-            self.link = uuid.uuid4().hex[:5]
+    @property
+    def short_link(self):
+        """Код короткой ссылки: сохранённый ранее или вычисленный по id."""
+        return self.link or shortlinks.encode(self.id)
 
 
 class RecipeIngredient(models.Model):
@@ -205,3 +249,93 @@ class ShoppingCart(PublishedModel):
     def __str__(self):
         """Возвращает имя объекта в виде строки."""
         return f'{self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Сводный список покупок пользователя."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Пользователь')
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, verbose_name='Ингредиент')
+    total_amount = models.IntegerField(
+        default=0, verbose_name='Общее количество')
+
+    class Meta:
+        """Мета данные."""
+
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Сводные списки покупок'
+        default_related_name = 'shoppinglistitems'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_shopping_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        """Возвращает имя объекта в виде строки."""
+        return f'{self.user}: {self.ingredient}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Пользователь')
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        """Мета данные."""
+
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        default_related_name = 'feed_entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_user_feed_recipe')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_timeline'),
+        ]
+
+    def __str__(self):
+        """Возвращает имя объекта в виде строки."""
+        return f'{self.user_id}: {self.recipe_id}'
+
+
+class RecipeNeighbour(models.Model):
+    """Похожий рецепт с оценкой сходства."""
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт',
+        related_name='neighbours')
+    neighbour = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Похожий рецепт',
+        related_name='+')
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        """Мета данные."""
+
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbour'],
+                name='unique_recipe_neighbour'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='recipe_neighbour_score'),
+        ]
+
+    def __str__(self):
+        """Возвращает имя объекта в виде строки."""
+        return f'{self.recipe_id} -> {self.neighbour_id}'
@@ -0,0 +1,82 @@
+"""Популярность рецептов с затуханием по времени."""
+from datetime import timedelta
+
+from django.db.models import (
+    Case, FloatField, OuterRef, Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from recipes.cache import bump_version
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+HALF_LIFE_DAYS = 7
+AGE_BUCKETS_DAYS = (1, 3, 7, 14, 30, 90, 365)
+EVENT_WEIGHTS = (
+    (Favorite, 1.0),
+    (ShoppingCart, 0.7),
+)
+
+
+def bucket_weights(half_life=HALF_LIFE_DAYS):
+    """Пары (граница в днях, вес) для ступенчатого затухания.
+
+    Вес события - 0.5 ** (возраст / период полураспада), возраст
+    берётся по середине ступени. События старше последней ступени
+    не учитываются.
+    """
+    weights = []
+    previous = 0
+    for bound in AGE_BUCKETS_DAYS:
+        weights.append((bound, 0.5 ** ((previous + bound) / 2 / half_life)))
+        previous = bound
+    return weights
+
+
+def event_score(model, weight, now, half_life=HALF_LIFE_DAYS):
+    """Подзапрос: сумма затухающих весов событий model для рецепта."""
+    decayed = Case(
+        *(When(created_at__gte=now - timedelta(days=bound),
+               then=Value(weight * bucket_weight))
+          for bound, bucket_weight in bucket_weights(half_life)),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .order_by().values('recipe')
+        .annotate(score=Sum(decayed)).values('score'),
+        output_field=FloatField()
+    ), Value(0.0))
+
+
+def popularity_expression(now=None, half_life=HALF_LIFE_DAYS):
+    """Выражение популярности: избранное и список покупок с затуханием."""
+    now = now or timezone.now()
+    scores = [
+        event_score(model, weight, now, half_life)
+        for model, weight in EVENT_WEIGHTS
+    ]
+    expression = scores[0]
+    for score in scores[1:]:
+        expression = expression + score
+    return expression
+
+
+def update_popularity(batch_size=5000, half_life=HALF_LIFE_DAYS):
+    """Пересчитывает популярность пачками по диапазонам id.
+
+    Каждая пачка - один UPDATE с подзапросами, так что блокировки
+    держатся недолго. Возвращает число обновлённых рецептов.
+    """
+    expression = popularity_expression(half_life=half_life)
+    ids = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return 0
+    updated = 0
+    for start in range(first, last + 1, batch_size):
+        updated += Recipe.objects.filter(
+            pk__gte=start, pk__lt=start + batch_size
+        ).update(popularity=expression)
+    bump_version('recipes')
+    return updated
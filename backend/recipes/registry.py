@@ -0,0 +1,61 @@
+"""Реестр тегов в памяти процесса."""
+import time
+
+from recipes.cache import get_version
+from recipes.models import Tag
+
+
+class TagRegistry:
+    """Теги в памяти воркера: slug -> id и готовые словари для ответа.
+
+    Актуальность сверяется с версией 'tags' в общем кэше не чаще
+    раза в check_interval секунд, поэтому изменения тегов в одном
+    воркере подхватываются остальными.
+    """
+
+    check_interval = 1.0
+
+    def __init__(self):
+        """Пустой реестр, загружается при первом обращении."""
+        self._version = None
+        self._checked_at = 0.0
+        self._state = ([], {}, {})
+
+    def invalidate(self):
+        """Сверить версию при следующем обращении."""
+        self._checked_at = 0.0
+
+    def _get_state(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            version = get_version('tags')
+            if version != self._version:
+                tags = list(Tag.objects.values('id', 'name', 'slug'))
+                self._state = (
+                    tags,
+                    {tag['id']: tag for tag in tags},
+                    {tag['slug']: tag['id'] for tag in tags},
+                )
+                self._version = version
+            self._checked_at = now
+        return self._state
+
+    def all(self):
+        """Все теги в порядке модели."""
+        return self._get_state()[0]
+
+    def get(self, tag_id):
+        """Словарь тега по id или None."""
+        return self._get_state()[1].get(tag_id)
+
+    def ids_for_slugs(self, slugs):
+        """Id тегов по списку slug."""
+        slug_map = self._get_state()[2]
+        return [slug_map[slug] for slug in slugs if slug in slug_map]
+
+    def choices(self):
+        """Варианты для фильтра по slug."""
+        return [(tag['slug'], tag['name']) for tag in self.all()]
+
+
+tag_registry = TagRegistry()
@@ -0,0 +1,30 @@
+"""Полнотекстовый поиск рецептов (PostgreSQL)."""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+
+SEARCH_CONFIG = 'russian'
+
+
+def search_vector_expression():
+    """Вектор по названию (A), описанию (B) и ингредиентам (C)."""
+    from recipes.models import RecipeIngredient
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+        .order_by().values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Пересчитывает сохранённые векторы для рецептов из queryset."""
+    if connection.vendor != 'postgresql':
+        return 0
+    return queryset.update(search_vector=search_vector_expression())
@@ -0,0 +1,47 @@
+"""Сводные списки покупок пользователей."""
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def change_shopping_lists(recipe_id, user_ids, sign):
+    """Добавляет (sign=1) или вычитает (sign=-1) рецепт в сводных списках."""
+    if not user_ids:
+        return
+    ingredient_ids = list(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+    if not ingredient_ids:
+        return
+    amount = Subquery(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id, ingredient=OuterRef('ingredient')
+    ).values('amount')[:1])
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=ingredient_ids)
+    if sign > 0:
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id in ingredient_ids
+        ], ignore_conflicts=True)
+        items.update(total_amount=F('total_amount') + amount)
+    else:
+        items.update(total_amount=F('total_amount') - amount)
+        items.filter(total_amount__lte=0).delete()
+
+
+@contextmanager
+def replacing_ingredients(recipe_id):
+    """Пересчитывает сводные списки при замене ингредиентов рецепта.
+
+    Рецепт вычитается из списков до изменения ингредиентов внутри блока
+    и добавляется обратно после него, всё в одной транзакции.
+    """
+    with transaction.atomic():
+        user_ids = list(ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True))
+        change_shopping_lists(recipe_id, user_ids, -1)
+        yield
+        change_shopping_lists(recipe_id, user_ids, 1)
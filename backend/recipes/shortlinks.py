@@ -0,0 +1,51 @@
+"""Кодирование id рецепта в короткую ссылку.
+
+Id переставляется сетью Фейстеля на половинах по 62**3 значений и
+записывается в base62 фиксированной длины. Перестановка взаимно
+однозначна, поэтому коды не пересекаются и не требуют проверки
+уникальности в базе, а соседние id дают непохожие коды.
+"""
+import string
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+CODE_LENGTH = 6
+HALF = BASE ** (CODE_LENGTH // 2)
+MODULUS = HALF * HALF
+ROUND_KEYS = (0x5BD1E995, 0x1B873593, 0x68E31DA4)
+CHAR_INDEX = {char: index for index, char in enumerate(ALPHABET)}
+
+SHORT_LINK_CACHE_KEY = 'short-link:{}'
+
+
+def _round(value, key):
+    return ((value ^ key) * 2654435761 >> 11) % HALF
+
+
+def encode(recipe_id):
+    """Короткий код для id рецепта."""
+    left, right = divmod(recipe_id % MODULUS, HALF)
+    for key in ROUND_KEYS:
+        left, right = right, (left + _round(right, key)) % HALF
+    value = left * HALF + right
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, BASE)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def decode(code):
+    """Id рецепта по короткому коду или None, если код не наш."""
+    if len(code) != CODE_LENGTH:
+        return None
+    value = 0
+    for char in code:
+        index = CHAR_INDEX.get(char)
+        if index is None:
+            return None
+        value = value * BASE + index
+    left, right = divmod(value, HALF)
+    for key in reversed(ROUND_KEYS):
+        left, right = (right - _round(left, key)) % HALF, left
+    return left * HALF + right
@@ -0,0 +1,156 @@
+"""Сигналы рецептов."""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from recipes.cache import bump_version, bump_version_on_commit
+from recipes.feed import schedule_fan_out
+from recipes.images import (
+    schedule_variants, schedule_variants_cleanup, stored_name)
+from recipes.ingredient_index import INDEX_VERSION, schedule_index_update
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag)
+from recipes.registry import tag_registry
+from recipes.shopping_lists import change_shopping_lists
+from recipes.shortlinks import SHORT_LINK_CACHE_KEY, encode
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    """Меняет версию справочника ингредиентов."""
+    bump_version_on_commit('ingredients')
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, **kwargs):
+    """Сбрасывает индекс рецептов: связи удалены каскадом."""
+    bump_version_on_commit(INDEX_VERSION)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def recipe_ingredient_changing(sender, instance, **kwargs):
+    """Переносит использование при замене ингредиента в строке рецепта."""
+    if instance._state.adding:
+        return
+    previous_id = RecipeIngredient.objects.filter(pk=instance.pk).values_list(
+        'ingredient_id', flat=True).first()
+    if previous_id is None or previous_id == instance.ingredient_id:
+        return
+    Ingredient.objects.filter(
+        pk=previous_id, recipes_count__gt=0
+    ).update(recipes_count=F('recipes_count') - 1)
+    Ingredient.objects.filter(pk=instance.ingredient_id).update(
+        recipes_count=F('recipes_count') + 1)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_added(sender, instance, created, **kwargs):
+    """Увеличивает счётчик рецептов ингредиента."""
+    if created:
+        Ingredient.objects.filter(pk=instance.ingredient_id).update(
+            recipes_count=F('recipes_count') + 1)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    """Уменьшает счётчик рецептов ингредиента."""
+    Ingredient.objects.filter(
+        pk=instance.ingredient_id, recipes_count__gt=0
+    ).update(recipes_count=F('recipes_count') - 1)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, **kwargs):
+    """Меняет версию справочника тегов после фиксации транзакции."""
+    def invalidate():
+        bump_version('tags')
+        tag_registry.invalidate()
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    """Меняет поколение рецептов для кэша анонимных ответов."""
+    bump_version_on_commit('recipes')
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Чистит кэш ссылок, индекс ингредиентов, счётчик автора и копии."""
+    codes = [encode(instance.id)]
+    if instance.link:
+        codes.append(instance.link)
+    cache.delete_many([SHORT_LINK_CACHE_KEY.format(code) for code in codes])
+    schedule_index_update(instance.id)
+    User.objects.filter(
+        pk=instance.author_id, recipes_count__gt=0
+    ).update(recipes_count=F('recipes_count') - 1)
+    if instance.image:
+        schedule_variants_cleanup(instance.image.name)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнюю картинку, чтобы удалить её копии."""
+    if update_fields is None or 'image' in update_fields:
+        instance._previous_image = stored_name(instance, 'image')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Обновляет счётчик автора, ленты подписчиков и копии картинки."""
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1)
+        schedule_fan_out(instance.id, instance.author_id)
+    if update_fields is None or 'image' in update_fields:
+        previous = getattr(instance, '_previous_image', '')
+        if previous and previous != instance.image.name:
+            schedule_variants_cleanup(previous)
+        if instance.image:
+            schedule_variants(
+                instance.image.name, Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    """Увеличивает счётчик избранного рецепта."""
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    """Уменьшает счётчик избранного рецепта."""
+    Recipe.objects.filter(
+        pk=instance.recipe_id, favorites_count__gt=0
+    ).update(favorites_count=F('favorites_count') - 1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(sender, instance, created, **kwargs):
+    """Добавляет рецепт в сводный список покупок пользователя."""
+    if created:
+        change_shopping_lists(instance.recipe_id, [instance.user_id], 1)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleting(sender, instance, **kwargs):
+    """Вычитает рецепт из сводного списка покупок пользователя.
+
+    Срабатывает до удаления, в том числе каскадного вместе с рецептом
+    или автором, пока ингредиенты рецепта ещё на месте.
+    """
+    change_shopping_lists(instance.recipe_id, [instance.user_id], -1)
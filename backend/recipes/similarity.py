@@ -0,0 +1,186 @@
+"""Похожие рецепты по пересечению ингредиентов и тегов."""
+import heapq
+import logging
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.db.models import Count, Q
+
+from recipes.images import get_executor
+from recipes.models import Recipe, RecipeIngredient, RecipeNeighbour
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOURS_LIMIT = 10
+INGREDIENT_WEIGHT = 0.8
+TAG_WEIGHT = 0.2
+COMMON_INGREDIENT_SHARE = 0.2
+COMMON_INGREDIENT_MIN = 1000
+
+
+def jaccard(first, second):
+    """Коэффициент Жаккара двух множеств."""
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+
+def similarity(ingredients, tags, recipe_id, neighbour_id):
+    """Сходство рецептов: взвешенный Жаккар ингредиентов и тегов."""
+    return (
+        INGREDIENT_WEIGHT * jaccard(
+            ingredients[recipe_id], ingredients[neighbour_id])
+        + TAG_WEIGHT * jaccard(tags[recipe_id], tags[neighbour_id])
+    )
+
+
+def common_threshold(recipes_total):
+    """Сколько рецептов может содержать ингредиент-кандидат.
+
+    Ингредиенты вроде соли встречаются почти везде: по ним не ищутся
+    кандидаты, иначе каждый рецепт сравнивался бы со всем каталогом.
+    В оценке сходства они по-прежнему учитываются.
+    """
+    return max(
+        int(recipes_total * COMMON_INGREDIENT_SHARE), COMMON_INGREDIENT_MIN)
+
+
+def load_sets(recipe_ids=None):
+    """Множества ингредиентов и тегов рецептов: ({id: set}, {id: set})."""
+    ingredient_rows = RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id')
+    tag_rows = Recipe.tags.through.objects.values_list('recipe_id', 'tag_id')
+    if recipe_ids is not None:
+        ingredient_rows = ingredient_rows.filter(recipe_id__in=recipe_ids)
+        tag_rows = tag_rows.filter(recipe_id__in=recipe_ids)
+    ingredients = defaultdict(set)
+    for recipe_id, ingredient_id in ingredient_rows.iterator(
+            chunk_size=10000):
+        ingredients[recipe_id].add(ingredient_id)
+    tags = defaultdict(set)
+    for recipe_id, tag_id in tag_rows.iterator(chunk_size=10000):
+        tags[recipe_id].add(tag_id)
+    return ingredients, tags
+
+
+def top_neighbours(scores, limit):
+    """Лучшие limit пар (id, оценка) по убыванию оценки."""
+    return heapq.nlargest(
+        limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def rebuild_neighbours(limit=NEIGHBOURS_LIMIT, batch_size=1000):
+    """Пересчитывает таблицу похожих рецептов целиком.
+
+    Кандидаты для каждого рецепта берутся из инвертированных списков
+    ингредиент -> рецепты, так что сравниваются только рецепты с общими
+    ингредиентами. Возвращает число записанных пар.
+    """
+    ingredients, tags = load_sets()
+    threshold = common_threshold(len(ingredients))
+    postings = defaultdict(list)
+    for recipe_id, ingredient_ids in ingredients.items():
+        for ingredient_id in ingredient_ids:
+            postings[ingredient_id].append(recipe_id)
+    postings = {
+        ingredient_id: recipe_ids
+        for ingredient_id, recipe_ids in postings.items()
+        if len(recipe_ids) <= threshold
+    }
+    written = 0
+    rows = []
+    with transaction.atomic():
+        RecipeNeighbour.objects.all().delete()
+        for recipe_id, ingredient_ids in ingredients.items():
+            candidates = set()
+            for ingredient_id in ingredient_ids:
+                candidates.update(postings.get(ingredient_id, ()))
+            candidates.discard(recipe_id)
+            scores = {
+                neighbour_id: similarity(
+                    ingredients, tags, recipe_id, neighbour_id)
+                for neighbour_id in candidates
+            }
+            rows.extend(
+                RecipeNeighbour(
+                    recipe_id=recipe_id, neighbour_id=neighbour_id,
+                    score=score)
+                for neighbour_id, score in top_neighbours(scores, limit)
+            )
+            if len(rows) >= batch_size:
+                RecipeNeighbour.objects.bulk_create(rows)
+                written += len(rows)
+                rows = []
+        RecipeNeighbour.objects.bulk_create(rows)
+    return written + len(rows)
+
+
+def refresh_neighbours(recipe_id, limit=NEIGHBOURS_LIMIT):
+    """Обновляет похожие рецепты после изменения одного рецепта.
+
+    Пересчитывается список самого рецепта, а в списки кандидатов он
+    добавляется, если вытесняет худшего соседа. Рецепты, у которых он
+    выпал из списка, до полного пересчёта показывают на одного меньше.
+    Кандидаты передаются в запросы подзапросом, а не списком id.
+    """
+    ingredient_ids = RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values('ingredient_id')
+    rare_ids = RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values('ingredient_id').annotate(total=Count('id')).filter(
+        total__lte=common_threshold(Recipe.objects.count())
+    ).values('ingredient_id')
+    candidate_ids = RecipeIngredient.objects.filter(
+        ingredient_id__in=rare_ids).exclude(
+            recipe_id=recipe_id).values('recipe_id')
+    ingredients, tags = load_sets(candidate_ids)
+    candidates = set(ingredients)
+    own_ingredients, own_tags = load_sets([recipe_id])
+    ingredients.update(own_ingredients)
+    tags.update(own_tags)
+    scores = {
+        neighbour_id: similarity(ingredients, tags, recipe_id, neighbour_id)
+        for neighbour_id in candidates
+    }
+    with transaction.atomic():
+        RecipeNeighbour.objects.filter(
+            Q(recipe_id=recipe_id) | Q(neighbour_id=recipe_id)).delete()
+        rows = [
+            RecipeNeighbour(
+                recipe_id=recipe_id, neighbour_id=neighbour_id, score=score)
+            for neighbour_id, score in top_neighbours(scores, limit)
+        ]
+        current = defaultdict(list)
+        for row in RecipeNeighbour.objects.filter(
+                recipe_id__in=candidate_ids).values_list(
+                    'recipe_id', 'score', 'id'):
+            current[row[0]].append(row[1:])
+        displaced = []
+        for neighbour_id, score in scores.items():
+            existing = current[neighbour_id]
+            if len(existing) >= limit:
+                weakest = min(existing)
+                if weakest[0] >= score:
+                    continue
+                displaced.append(weakest[1])
+            rows.append(RecipeNeighbour(
+                recipe_id=neighbour_id, neighbour_id=recipe_id, score=score))
+        RecipeNeighbour.objects.filter(pk__in=displaced).delete()
+        RecipeNeighbour.objects.bulk_create(rows)
+
+
+def _refresh_safely(recipe_id):
+    try:
+        refresh_neighbours(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обновить похожие рецепты %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_neighbours(recipe_id):
+    """Ставит обновление похожих рецептов в фоновый пул после фиксации.
+
+    Пересчёт не задерживает ответ на запрос записи.
+    """
+    transaction.on_commit(
+        lambda: get_executor().submit(_refresh_safely, recipe_id))
@@ -0,0 +1,62 @@
+"""Запросы импорта ингредиентов через COPY."""
+import re
+from unittest import mock
+
+from django.test import TestCase
+
+from recipes.management.commands import import_ingredients
+from recipes.models import Ingredient
+
+INSERT_PATTERN = re.compile(
+    r'INSERT INTO (\w+) \(([^)]*)\) '
+    r'SELECT DISTINCT ON \(name\) (.*?) FROM ingredient_import ')
+
+
+class ImportCopyTest(TestCase):
+    """INSERT из временной таблицы заполняет все NOT NULL столбцы."""
+
+    def run_copy(self, update=False):
+        """Запускает import_copy на курсоре-заглушке и возвращает его."""
+        rows = [
+            {'name': 'Соль', 'measurement_unit': 'г',
+             'normalized_name': 'соль'},
+            {'name': 'Мука', 'measurement_unit': 'г',
+             'normalized_name': 'мука'},
+        ]
+        with mock.patch.object(
+                import_ingredients, 'connection') as connection:
+            cursor = connection.cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [(True,), (False,)]
+            stats = import_ingredients.Command().import_copy(
+                iter(rows), {'update': update, 'batch_size': 10})
+        self.assertEqual(
+            stats, {'inserted': 1, 'updated': 1, 'skipped': 0})
+        return cursor
+
+    def test_insert_columns(self):
+        """Столбцы INSERT - все столбцы таблицы, кроме первичного ключа."""
+        for update in (False, True):
+            with self.subTest(update=update):
+                cursor = self.run_copy(update)
+                sql = cursor.execute.call_args_list[-1].args[0]
+                match = INSERT_PATTERN.match(sql)
+                self.assertIsNotNone(match, sql)
+                table, columns, values = match.groups()
+                columns = columns.split(', ')
+                self.assertEqual(table, Ingredient._meta.db_table)
+                self.assertCountEqual(columns, [
+                    field.column for field in Ingredient._meta.concrete_fields
+                    if not field.primary_key and not field.null
+                ])
+                self.assertEqual(len(values.split(', ')), len(columns))
+                self.assertNotIn('recipes_count', sql.split('ON CONFLICT')[1])
+
+    def test_copy_payload(self):
+        """COPY получает строки в порядке объявленных столбцов."""
+        cursor = self.run_copy()
+        sql, buffer = cursor.copy_expert.call_args.args
+        self.assertIn(
+            f'({", ".join(import_ingredients.COPY_FIELDS)})', sql)
+        self.assertEqual(
+            buffer.getvalue().splitlines(),
+            ['Соль,г,соль', 'Мука,г,мука'])
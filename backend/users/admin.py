@@ -12,9 +12,12 @@ User = get_user_model()
 class UserProfileAdmin(UserAdmin):
     """Админ-панель для кастомной модели пользователя."""
 
-    list_display = ('pk', 'username', 'display_avatar')
+    list_display = (
+        'pk', 'username', 'recipes_count', 'followers_count',
+        'display_avatar')
     search_fields = ('email', 'username')
     list_display_links = ('username',)
+    show_full_result_count = False
 
     @admin.display(description='Аватар пользователя')
     def display_avatar(self, obj):
@@ -33,3 +36,6 @@ class SubscriptionAdmin(admin.ModelAdmin):
     """Админ-панель для подписок пользователей."""
 
     list_display = ('user', 'subscribed_to')
+    list_select_related = ('user', 'subscribed_to')
+    autocomplete_fields = ('user', 'subscribed_to')
+    show_full_result_count = False
@@ -8,3 +8,7 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = 'Пользователи'
+
+    def ready(self):
+        """Подключает сигналы."""
+        from users import signals  # noqa: F401
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+def delete_self_subscriptions(apps, schema_editor):
+    Subscription = apps.get_model('users', 'Subscription')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    subscriptions = Subscription.objects.filter(
+        user=models.F('subscribed_to'))
+    user_ids = list(subscriptions.values_list('user_id', flat=True))
+    if not user_ids:
+        return
+    subscriptions.delete()
+    UserProfile.objects.filter(
+        pk__in=user_ids, followers_count__gt=0
+    ).update(followers_count=models.F('followers_count') - 1)
+    UserProfile.objects.filter(
+        pk__in=user_ids, following_count__gt=0
+    ).update(following_count=models.F('following_count') - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_userprofile_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_self_subscriptions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.CheckConstraint(check=models.Q(('user', models.F('subscribed_to')), _negated=True), name='prevent_self_subscription'),
+        ),
+    ]
@@ -36,6 +36,15 @@ class UserProfile(AbstractUser):
         blank=True,
         default=None
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Рецептов')
+    followers_count = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False,
+        verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписок')
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Дата изменения')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
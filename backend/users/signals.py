@@ -0,0 +1,84 @@
+"""Сигналы пользователей."""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens, invalidate_user_tokens
+from recipes.cache import bump_version_on_commit
+from recipes.feed import (
+    backfill, backfill_followers, remove_author, schedule)
+from recipes.images import (
+    schedule_variants, schedule_variants_cleanup, stored_name)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежний аватар, чтобы удалить его копии."""
+    if update_fields is None or 'avatar' in update_fields:
+        instance._previous_avatar = stored_name(instance, 'avatar')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает кэши пользователя и обновляет копии аватара."""
+    invalidate_user_tokens(instance.pk)
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        bump_version_on_commit('recipes')
+    if update_fields is None or 'avatar' in update_fields:
+        previous = getattr(instance, '_previous_avatar', '')
+        if previous and previous != instance.avatar.name:
+            schedule_variants_cleanup(previous)
+        if instance.avatar:
+            schedule_variants(
+                instance.avatar.name, User.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Удаляет копии аватара удалённого пользователя."""
+    if instance.avatar:
+        schedule_variants_cleanup(instance.avatar.name)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_added(sender, instance, created, **kwargs):
+    """Увеличивает счётчики подписок и заполняет ленту подписчика."""
+    if created:
+        User.objects.filter(pk=instance.user_id).update(
+            following_count=F('following_count') + 1)
+        User.objects.filter(pk=instance.subscribed_to_id).update(
+            followers_count=F('followers_count') + 1)
+        schedule(backfill, instance.user_id, instance.subscribed_to_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    """Уменьшает счётчики подписок и чистит ленту подписчика.
+
+    Если у автора осталось FEED_FANOUT_LIMIT подписчиков, его рецепты
+    снова раскладываются по лентам, и ленты подписчиков заполняются.
+    """
+    User.objects.filter(
+        pk=instance.user_id, following_count__gt=0
+    ).update(following_count=F('following_count') - 1)
+    authors = User.objects.filter(pk=instance.subscribed_to_id)
+    if authors.filter(
+        followers_count=settings.FEED_FANOUT_LIMIT + 1
+    ).update(followers_count=F('followers_count') - 1):
+        schedule(backfill_followers, instance.subscribed_to_id)
+    else:
+        authors.filter(followers_count__gt=0).update(
+            followers_count=F('followers_count') - 1)
+    schedule(remove_author, instance.user_id, instance.subscribed_to_id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Убирает удалённый токен из кэша аутентификации."""
+    invalidate_tokens(instance.key)